@@ -1,12 +1,117 @@
 import os
 import uuid
+import shutil
 import tempfile
 import streamlit as st
-from langchain_community.document_loaders import PyPDFLoader
+from telemetry import get_tracer
+
+COPY_CHUNK_SIZE = 1024 * 1024  # Bytes copied at a time when spooling an upload to disk
+
+
+class LocalPDF:
+    """
+    Adapts a PDF on disk to the uploaded-file interface DocumentProcessor expects (name + getvalue()).
+    DocumentProcessor reads `path` directly, so the file is never loaded into memory as a whole.
+    """
+    def __init__(self, path, name=None):
+        self.path = path
+        self.name = name or os.path.basename(path)
+        self.size = os.path.getsize(path)
+
+    def getvalue(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+def page_may_have_text(page):
+    """
+    Cheap check (no content-stream parsing) whether a pypdf page can contain text at all:
+    drawing text needs a font, either in the page's resources or in a form XObject it uses.
+    Pages with no contents, or image-only pages (scans without an OCR layer), return False.
+    """
+    if page.get("/Contents") is None:
+        return False
+    resources = page.get("/Resources")
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    if "/Font" in resources:
+        return True
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        for xobject in xobjects.get_object().values():
+            if xobject.get_object().get("/Subtype") == "/Form":
+                return True
+    return False
+
+
+def iter_pdf_pages(path, page_window=50, max_pages=None, skip_blank_pages=True, stats=None):
+    """
+    Lazily yields (page_number, text) for a PDF on disk, one page at a time.
+
+    pypdf reads objects from the file on demand and caches every object it resolves (content streams, fonts,
+    images), so the cache is dropped after every window of `page_window` pages and never holds more than one
+    window. At most `max_pages` pages are read. With `skip_blank_pages`, pages that cannot contain text are
+    skipped before extraction, and pages whose extracted text is empty after it.
+    `stats` (a dict), if given, receives total_pages, read_pages, skipped_pages and truncated.
+    """
+    from pypdf import PdfReader
+
+    stats = stats if stats is not None else {}
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        total_pages = len(reader.pages)
+        limit = min(total_pages, max_pages) if max_pages else total_pages
+        stats.update({"total_pages": total_pages, "read_pages": 0, "skipped_pages": 0,
+                      "truncated": limit < total_pages})
+
+        for index in range(limit):
+            if index and index % page_window == 0:
+                reader.resolved_objects.clear()
+            page = reader.pages[index]
+            if skip_blank_pages and not page_may_have_text(page):
+                stats["skipped_pages"] += 1
+                continue
+            text = page.extract_text()
+            if skip_blank_pages and not text.strip():
+                stats["skipped_pages"] += 1
+                continue
+            stats["read_pages"] += 1
+            yield index + 1, text
+
+
+def current_rss_bytes():
+    """
+    Resident set size of this process. Reads /proc/self/statm (cheap enough to sample per page);
+    elsewhere falls back to the peak RSS reported by getrusage.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, page_window=50, max_pages=2000, max_bytes=200 * 1024 * 1024, skip_blank_pages=True,
+                 track_memory=True):
+        """
+        page_window: Number of pages parsed before pypdf's object cache is dropped.
+        max_pages: Maximum number of pages read from one PDF (None for no limit); later pages are ignored.
+        max_bytes: PDFs larger than this are rejected (None for no limit).
+        skip_blank_pages: Skip empty and image-only pages.
+        track_memory: Sample the process RSS after every page and report each document's peak (in self.reports).
+        """
         self.pages = []  # Store all Documents, where each Document corresponds to a page of a PDF
+        self.reports = []  # One dict per processed PDF: pages read/skipped, truncation, peak memory
+        self.page_window = page_window
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.skip_blank_pages = skip_blank_pages
+        self.track_memory = track_memory
 
     def ingest_documents(self):
         """
@@ -23,30 +128,91 @@ class DocumentProcessor:
 
         if uploaded_files:
             for uploaded_file in uploaded_files:
-                # Generate a globally unique identifier for this PDF
-                pdf_uuid = str(uuid.uuid4())
+                self.ingest_uploaded_file(uploaded_file)
+                report = self.reports[-1]
+                if report.get("error"):
+                    st.error(f"{report['source']}: {report['error']}")
+                    continue
+                message = (f"{report['source']}: {report['read_pages']} pages read, "
+                           f"{report['skipped_pages']} empty/image-only pages skipped")
+                if report["peak_rss_mb"] is not None:
+                    message += f", peak memory {report['peak_rss_mb']:.0f} MB (+{report['rss_growth_mb']:.0f} MB)"
+                st.write(message)
+                if report["truncated"]:
+                    st.warning(f"{report['source']}: only the first {self.max_pages} of "
+                               f"{report['total_pages']} pages were processed.")
 
-                # Save the PDF as a temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                    temp_file_name = temp_file.name
-                    temp_file.write(uploaded_file.getvalue())
+            st.write(f"Total pages processed: {len(self.pages)}")
 
-                try:
-                    # Use PyPDFLoader to read the PDF page by page
-                    loader = PyPDFLoader(temp_file_name)
-                    extracted_pages = loader.load()  # List[Document]
+    def ingest_uploaded_file(self, uploaded_file):
+        """
+        Process a single uploaded PDF page by page and append its pages to self.pages.
+        `uploaded_file` only needs a `name` attribute and a `getvalue()` method returning the PDF bytes,
+        so it works with Streamlit's UploadedFile as well as outside Streamlit. File-like uploads are spooled
+        to disk in chunks, and uploads with a `path` (LocalPDF) are read in place.
+        Returns the list of extracted pages.
+        """
+        with get_tracer().span("parse") as span:
+            return self._ingest_uploaded_file(uploaded_file, span)
 
-                    # Add metadata to each Document page
-                    for idx, page in enumerate(extracted_pages, start=1):
-                        page.metadata["source"] = uploaded_file.name
-                        page.metadata["page"] = idx
-                        page.metadata["pdf_uuid"] = pdf_uuid
+    def _spool_to_temp_file(self, uploaded_file):
+        # Save the PDF as a temporary file, copying in chunks instead of materializing another full copy
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+            if hasattr(uploaded_file, "read") and hasattr(uploaded_file, "seek"):
+                uploaded_file.seek(0)
+                shutil.copyfileobj(uploaded_file, temp_file, COPY_CHUNK_SIZE)
+            else:
+                temp_file.write(uploaded_file.getvalue())
+            return temp_file.name
 
-                    # Append to the overall pages list
-                    self.pages.extend(extracted_pages)
+    def _ingest_uploaded_file(self, uploaded_file, span):
+        from langchain_core.documents import Document
 
-                finally:
-                    # Delete the temporary PDF file
-                    os.unlink(temp_file_name)
+        report = {"source": uploaded_file.name, "total_pages": 0, "read_pages": 0, "skipped_pages": 0,
+                  "truncated": False, "peak_rss_mb": None, "rss_growth_mb": None, "error": None}
+        self.reports.append(report)
 
-            st.write(f"Total pages processed: {len(self.pages)}")
+        size = getattr(uploaded_file, "size", None)
+        if self.max_bytes and size is not None and size > self.max_bytes:
+            report["error"] = f"file is {size / 1e6:.1f} MB, the limit is {self.max_bytes / 1e6:.1f} MB"
+            span["rejected"] = 1
+            return []
+
+        # Generate a globally unique identifier for this PDF
+        pdf_uuid = str(uuid.uuid4())
+
+        temp_file_name = None
+        path = getattr(uploaded_file, "path", None)
+        if path is None:
+            temp_file_name = self._spool_to_temp_file(uploaded_file)
+            path = temp_file_name
+        span["bytes"] = os.path.getsize(path)
+
+        start_rss = peak_rss = current_rss_bytes() if self.track_memory else 0
+        extracted_pages = []
+        try:
+            # Read the PDF lazily, window by window, adding metadata to each Document page
+            for page_number, text in iter_pdf_pages(path, self.page_window, self.max_pages,
+                                                    self.skip_blank_pages, stats=report):
+                extracted_pages.append(Document(
+                    page_content=text,
+                    metadata={"source": uploaded_file.name, "page": page_number, "pdf_uuid": pdf_uuid}
+                ))
+                if self.track_memory:
+                    peak_rss = max(peak_rss, current_rss_bytes())
+
+            # Append to the overall pages list
+            self.pages.extend(extracted_pages)
+
+        finally:
+            if self.track_memory:
+                report["peak_rss_mb"] = peak_rss / (1024 * 1024)
+                report["rss_growth_mb"] = (peak_rss - start_rss) / (1024 * 1024)
+                span["rss_growth_mb"] = report["rss_growth_mb"]
+            # Delete the temporary PDF file
+            if temp_file_name:
+                os.unlink(temp_file_name)
+
+        span["pages"] = len(extracted_pages)
+        span["skipped_pages"] = report["skipped_pages"]
+        return extracted_pages
@@ -0,0 +1,256 @@
+# batch_quiz.py
+"""
+Headless bulk quiz generation: every PDF in a directory x every topic -> validated questions in a JSONL file.
+
+    python batch_quiz.py --pdf-dir ./course_pdfs --topics "Photosynthesis" "Cell division" --out quizzes.jsonl
+
+Documents are ingested (parsed, chunked, embedded into their own Chroma collection) in parallel, then the
+(document, topic) quiz jobs run in parallel. Progress is checkpointed, so re-running the same command
+resumes: ingested documents are re-opened instead of re-embedded and finished jobs are skipped.
+"""
+import argparse
+import contextvars
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from File_uploader import DocumentProcessor, LocalPDF
+from vertex_embedding import EmbeddingClient
+from integration import ChromaCollectionCreator
+from quiz_algo import QuizGenerator
+from telemetry import get_tracer, Tracer
+
+
+def collection_name_for(path):
+    """
+    Stable Chroma collection name for a PDF (changes when the file changes).
+    """
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return "doc-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class Checkpoint:
+    """
+    Append-only JSONL record of finished work: {"type": "ingested", ...} and {"type": "quiz", ...} lines.
+    Quizzes are keyed by collection name (see collection_name_for), so a PDF that changed since it was
+    checkpointed is ingested and quizzed again.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.ingested = {}    # pdf path -> collection name
+        self.quizzes = set()  # (collection name, topic)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    self._apply(json.loads(line))
+
+    def _apply(self, record):
+        if record["type"] == "ingested":
+            self.ingested[record["pdf"]] = record["collection"]
+        elif record["type"] == "quiz":
+            # Quiz records of older checkpoints have no collection: use the one the PDF was ingested into
+            self.quizzes.add((record.get("collection") or self.ingested.get(record["pdf"]), record["topic"]))
+
+    def record(self, **record):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self._apply(record)
+
+
+class QuestionWriter:
+    """
+    Thread-safe JSONL writer that flushes every question as soon as it is validated.
+    """
+    def __init__(self, path, checkpoint, collections):
+        """
+        collections: {pdf path: current collection name} of the PDFs in this run.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._drop_unfinished(checkpoint, collections)
+        self._file = open(path, "a")
+
+    def _drop_unfinished(self, checkpoint, collections):
+        # Questions of jobs that were interrupted (or of PDFs that changed since) will be generated again,
+        # so drop their old output.
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            records = [(line, json.loads(line)) for line in f if line.strip()]
+        kept = [line for line, record in records
+                if (collections.get(record["pdf"]), record["topic"]) in checkpoint.quizzes]
+        with open(self.path, "w") as f:
+            f.writelines(kept)
+
+    def write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def ingest(path, collection_name, embed_client, checkpoint, persist_directory, embedding_reducer=None):
+    """
+    Returns (ChromaCollectionCreator, pages_parsed) for one PDF, re-opening its collection if the same version
+    of the PDF was already ingested.
+    """
+    if checkpoint.ingested.get(path) == collection_name:
+        creator = ChromaCollectionCreator(None, embed_client, persist_directory, collection_name)
+        creator.load_chroma_collection()
+        return creator, 0
+
+    processor = DocumentProcessor()
+    processor.ingest_uploaded_file(LocalPDF(path))
+    report = processor.reports[-1]
+    if report["error"]:
+        raise RuntimeError(report["error"])
+    if report["truncated"]:
+        print(f"[ingest] {path}: warning: only the first {processor.max_pages} of {report['total_pages']} "
+              f"pages were processed")
+    if not processor.pages:
+        raise RuntimeError("no text could be extracted")
+    creator = ChromaCollectionCreator(processor, embed_client, persist_directory, collection_name,
+                                      embedding_reducer=embedding_reducer)
+    creator.create_chroma_collection()
+    if creator.db is None:
+        raise RuntimeError(f"could not build the Chroma collection: {creator.error}")
+    checkpoint.record(type="ingested", pdf=path, collection=creator.collection_name, pages=len(processor.pages))
+    return creator, len(processor.pages)
+
+
+def generate(path, topic, creator, num_questions, writer, checkpoint):
+    """
+    Generates one quiz, streaming each validated question to the writer. Returns the number of questions.
+    """
+    generator = QuizGenerator(topic, num_questions, creator)
+    count = 0
+    for index, question in enumerate(generator.iter_questions()):
+        writer.write({"pdf": path, "topic": topic, "index": index, **question})
+        count += 1
+    checkpoint.record(type="quiz", pdf=path, collection=creator.collection_name, topic=topic, questions=count)
+    return count
+
+
+def read_topics(args):
+    topics = list(args.topics or [])
+    if args.topics_file:
+        with open(args.topics_file) as f:
+            topics.extend(line.strip() for line in f if line.strip())
+    return topics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate quizzes for every PDF in a directory and every topic.")
+    parser.add_argument("--pdf-dir", required=True, help="Directory containing the PDFs (searched recursively).")
+    parser.add_argument("--topics", nargs="*", help="Quiz topics.")
+    parser.add_argument("--topics-file", help="File with one topic per line.")
+    parser.add_argument("--num-questions", type=int, default=5, help="Questions per (PDF, topic), at most 10.")
+    parser.add_argument("--out", default="quizzes.jsonl", help="Output JSONL file (one question per line).")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <out>.checkpoint).")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel documents / quiz jobs.")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--embedding-model", default="textembedding-gecko@003")
+    parser.add_argument("--location", default="us-central1")
+    parser.add_argument("--embedding-reducer", help="Reduce stored embeddings, e.g. pca:128 or truncate:256.")
+    args = parser.parse_args()
+
+    if not 1 <= args.num_questions <= 10:
+        parser.error("--num-questions must be between 1 and 10")
+
+    topics = read_topics(args)
+    if not topics:
+        parser.error("provide --topics and/or --topics-file")
+
+    pdfs = sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(args.pdf_dir)
+        for name in files if name.lower().endswith(".pdf")
+    )
+    if not pdfs:
+        parser.error(f"no PDFs found in {args.pdf_dir}")
+
+    checkpoint = Checkpoint(args.checkpoint or args.out + ".checkpoint")
+    collections = {path: collection_name_for(path) for path in pdfs}
+    writer = QuestionWriter(args.out, checkpoint, collections)
+    embed_client = EmbeddingClient(model_name=args.embedding_model, location=args.location)
+    tracer = get_tracer()
+    run_id = tracer.start_run("batch")
+
+    start = time.perf_counter()
+    stats = {"pages": 0, "docs_failed": 0, "jobs_done": 0, "jobs_skipped": 0, "jobs_failed": 0, "questions": 0}
+    creators = {}
+
+    # 1) Ingest all documents in parallel
+    pending = [p for p in pdfs if any((collections[p], t) not in checkpoint.quizzes for t in topics)]
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        # Each task runs in a copy of this context, so its spans are traced into the batch run
+        futures = {pool.submit(contextvars.copy_context().run, ingest, p, collections[p], embed_client, checkpoint,
+                               args.persist_directory, args.embedding_reducer): p for p in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                creators[path], pages = future.result()
+                stats["pages"] += pages
+                print(f"[ingest] {path}: ready ({pages} new pages)")
+            except Exception as e:
+                stats["docs_failed"] += 1
+                print(f"[ingest] {path}: failed: {e}")
+    ingest_seconds = time.perf_counter() - start
+
+    # 2) Generate every (document, topic) quiz in parallel
+    jobs = []
+    for path in pdfs:
+        for topic in topics:
+            if (collections[path], topic) in checkpoint.quizzes:
+                stats["jobs_skipped"] += 1
+            elif path in creators:
+                jobs.append((path, topic))
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(contextvars.copy_context().run, generate, path, topic, creators[path], args.num_questions,
+                        writer, checkpoint): (path, topic)
+            for path, topic in jobs
+        }
+        for future in as_completed(futures):
+            path, topic = futures[future]
+            try:
+                count = future.result()
+                stats["jobs_done"] += 1
+                stats["questions"] += count
+                print(f"[quiz] {path} / {topic}: {count} questions")
+            except Exception as e:
+                stats["jobs_failed"] += 1
+                print(f"[quiz] {path} / {topic}: failed: {e}")
+    writer.close()
+
+    # 3) Throughput summary
+    elapsed = time.perf_counter() - start
+    generate_seconds = elapsed - ingest_seconds
+    print("\n===== Batch summary =====")
+    print(f"PDFs: {len(pdfs)} ({stats['docs_failed']} failed), pages parsed: {stats['pages']} "
+          f"in {ingest_seconds:.1f}s ({stats['pages'] / ingest_seconds if ingest_seconds else 0:.1f} pages/s)")
+    print(f"Quiz jobs: {stats['jobs_done']} done, {stats['jobs_skipped']} skipped (checkpoint), {stats['jobs_failed']} failed")
+    print(f"Questions: {stats['questions']} in {generate_seconds:.1f}s "
+          f"({stats['questions'] / generate_seconds * 60 if generate_seconds else 0:.1f} questions/min)")
+    print(f"Total: {elapsed:.1f}s, output: {args.out}")
+    print("Time per stage (self seconds):")
+    for stage, entry in sorted(Tracer.breakdown(tracer.get_run(run_id)).items(), key=lambda item: -item[1]["self_seconds"]):
+        print(f"  {stage:<16} {entry['self_seconds']:>8.2f}s  ({entry['calls']} calls)")
+    return 1 if stats["jobs_failed"] or stats["docs_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
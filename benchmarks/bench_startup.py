@@ -0,0 +1,140 @@
+# bench_startup.py
+"""
+Measures Streamlit cold-start and rerun cost of quizzify.py:
+  - cold import time (fresh interpreter) of the modules each screen needs, and which heavy
+    dependencies (langchain_google_vertexai, chromadb, pypdf, ...) get loaded
+  - rerun latency of the Quiz Display Screen, driven headlessly with streamlit.testing's AppTest
+    and a pre-seeded quiz (no Vertex AI credentials needed)
+
+Pass --ref <git ref> to run the same measurements against an older checkout and print both side by side:
+    python benchmarks/bench_startup.py --ref HEAD~1
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY_MODULES = ["langchain_google_vertexai", "langchain_community", "chromadb", "pypdf", "langchain_core"]
+
+# Modules imported by each screen of quizzify.py before this change made them lazy.
+SCREENS = {
+    "display": ["streamlit", "ui"],
+    "builder": ["streamlit", "ui", "File_uploader", "vertex_embedding", "integration", "quiz_algo"],
+}
+
+IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+RERUN_PROBE = """
+import json, os, sys, tempfile, time
+sys.path.insert(0, {root!r})
+os.chdir({root!r})
+os.environ["QUIZZIFY_QUIZ_STORE"] = os.path.join(tempfile.mkdtemp(), "quiz_store.sqlite3")
+from streamlit.testing.v1 import AppTest
+
+question = {{
+    "question": "Which organelle produces most of a cell's ATP?",
+    "choices": [{{"key": "A", "value": "Mitochondria"}}, {{"key": "B", "value": "Nucleus"}},
+                {{"key": "C", "value": "Ribosome"}}, {{"key": "D", "value": "Golgi body"}}],
+    "answer": "A",
+    "explanation": "Mitochondria run oxidative phosphorylation.",
+}}
+questions = [dict(question, question=f"{{i}}. " + question["question"]) for i in range(10)]
+at = AppTest.from_file("quizzify.py", default_timeout=60)
+if os.path.exists("quiz_store.py"):
+    # Server-side quiz store: the session only holds the quiz ID
+    from quiz_store import get_quiz_store
+    store = get_quiz_store()
+    at.session_state["quiz_id"] = store.create_quiz("biology", len(questions), questions)
+    store.finish_quiz(at.session_state["quiz_id"])
+else:
+    at.session_state["question_bank"] = questions
+at.session_state["display_quiz"] = True
+at.session_state["question_index"] = 0
+
+times = []
+for _ in range({reruns}):
+    start = time.perf_counter()
+    at.run()
+    times.append(time.perf_counter() - start)
+print(json.dumps({{"first": times[0], "rerun_median": sorted(times[1:])[len(times[1:]) // 2] if len(times) > 1 else times[0],
+                  "exceptions": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def run_probe(code):
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(root, repeats, reruns):
+    report = {}
+    for screen, modules in SCREENS.items():
+        samples = [run_probe(IMPORT_PROBE.format(root=root, modules=modules, heavy=HEAVY_MODULES)) for _ in range(repeats)]
+        report[f"import_{screen}"] = {
+            "seconds_median": sorted(s["seconds"] for s in samples)[len(samples) // 2],
+            "heavy_modules": samples[0]["heavy"],
+        }
+    report["display_rerun"] = run_probe(RERUN_PROBE.format(root=root, reruns=reruns))
+    return report
+
+
+def checkout(ref, target):
+    """
+    Extracts `ref` into `target` with git archive (no worktree bookkeeping left behind).
+    """
+    archive = subprocess.run(["git", "-C", REPO_ROOT, "archive", ref], capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", target], input=archive.stdout, check=True)
+
+
+def print_report(reports):
+    names = list(reports)
+    print(f"{'metric':<34}" + "".join(f"{name:>22}" for name in names))
+    for screen in SCREENS:
+        key = f"import_{screen}"
+        print(f"{'cold import, ' + screen + ' screen (s)':<34}" +
+              "".join(f"{reports[n][key]['seconds_median']:>22.3f}" for n in names))
+    print(f"{'display screen first run (s)':<34}" + "".join(f"{reports[n]['display_rerun']['first']:>22.3f}" for n in names))
+    print(f"{'display screen rerun median (s)':<34}" +
+          "".join(f"{reports[n]['display_rerun']['rerun_median']:>22.3f}" for n in names))
+    for name in names:
+        print(f"\n[{name}] heavy modules loaded by the display screen: "
+              f"{', '.join(reports[name]['import_display']['heavy_modules']) or 'none'}")
+        if reports[name]["display_rerun"]["exceptions"]:
+            print(f"[{name}] app exceptions: {reports[name]['display_rerun']['exceptions']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit startup / rerun latency benchmark for quizzify.py.")
+    parser.add_argument("--ref", help="Also measure this git ref (e.g. HEAD~1) for comparison.")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per import measurement.")
+    parser.add_argument("--reruns", type=int, default=10, help="AppTest runs of the display screen.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    reports = {"working tree": measure(REPO_ROOT, args.repeats, args.reruns)}
+    if args.ref:
+        with tempfile.TemporaryDirectory() as old_root:
+            checkout(args.ref, old_root)
+            reports[args.ref] = measure(old_root, args.repeats, args.reruns)
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# eval_reduction.py
+"""
+Evaluates embedding dimensionality reduction (embedding_reducer.py): for every method and target dimension,
+recall@k against exact search on the full-width vectors, and query latency.
+
+Each row reports:
+  - exact recall: brute-force search in the reduced space, i.e. the neighbours lost by the reduction alone
+  - index recall: the Chroma HNSW index built on the reduced vectors, as the app would query it
+  - per-query latency of the index (p50/p95) and of batched brute force, and the raw vector size
+
+Vectors come from one of three sources:
+  --vectors file.npy   real embeddings (e.g. textembedding-gecko@003 chunks), the only realistic choice
+  --source spectrum    unit vectors with a power-law variance spectrum, roughly like sentence embeddings (default)
+  --source corpus      the synthetic PDF corpus embedded with the stub; its small vocabulary makes it low-rank,
+                       so PCA looks lossless on it
+A random subset of rows is held out as queries; the rest is indexed.
+
+Usage:
+    python benchmarks/eval_reduction.py --dims 512 256 128 64 32
+    python benchmarks/eval_reduction.py --vectors gecko_chunks.npy --methods pca --k 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from hnsw_sweep import exact_distances, recall_at_k, synthetic_vectors
+from run_benchmarks import percentile
+
+from embedding_reducer import make_reducer
+from integration import hnsw_metadata
+
+
+def spectrum_vectors(count, dim, decay, seed):
+    """
+    Unit vectors whose coordinates (in a random basis) have variance ~ 1 / rank**decay.
+    """
+    rng = np.random.default_rng(seed)
+    scales = 1.0 / np.arange(1, dim + 1) ** (decay / 2)
+    basis, _ = np.linalg.qr(rng.standard_normal((dim, dim)))
+    vectors = (rng.standard_normal((count, dim)) * scales) @ basis.T
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def top_k(distances, k):
+    ids = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return [[str(i) for i in row] for row in ids]
+
+
+def evaluate(client, method, dim, corpus, queries, truth, args):
+    """
+    One row of the report. `truth` holds the exact full-width distances from every query to every corpus vector.
+    """
+    reducer = make_reducer(f"{method}:{dim}") if method != "none" else None
+    start = time.perf_counter()
+    if reducer is not None:
+        reducer.fit(corpus)
+        reduced_corpus = np.asarray(reducer.transform(corpus), dtype=np.float32)
+        reduced_queries = np.asarray(reducer.transform(queries), dtype=np.float32)
+    else:
+        reduced_corpus, reduced_queries = corpus, queries
+    fit_seconds = time.perf_counter() - start
+
+    # Brute force in the reduced space: the loss caused by the reduction alone
+    start = time.perf_counter()
+    reduced_distances = exact_distances(args.space, reduced_corpus, reduced_queries)
+    brute_ms = (time.perf_counter() - start) / len(queries) * 1000
+    exact_recall = recall_at_k(truth, top_k(reduced_distances, args.k), args.k)
+
+    # The Chroma index, as the app queries it
+    name = f"eval-{method}-{dim}"
+    collection = client.create_collection(name, metadata=hnsw_metadata(
+        space=args.space, M=args.M, construction_ef=args.construction_ef, search_ef=args.search_ef
+    ))
+    for i in range(0, len(reduced_corpus), 1000):
+        collection.add(ids=[str(j) for j in range(i, min(i + 1000, len(reduced_corpus)))],
+                       embeddings=reduced_corpus[i:i + 1000].tolist())
+    latencies = []
+    results = []
+    for query in reduced_queries:
+        t0 = time.perf_counter()
+        results.append(collection.query(query_embeddings=[query.tolist()], n_results=args.k, include=[])["ids"][0])
+        latencies.append(time.perf_counter() - t0)
+    client.delete_collection(name)
+
+    return {
+        "method": method,
+        "dim": reduced_corpus.shape[1],
+        "fit_s": fit_seconds,
+        "explained_variance": getattr(reducer, "explained_variance", None),
+        "exact_recall": exact_recall,
+        "index_recall": recall_at_k(truth, results, args.k),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "brute_force_ms": brute_ms,
+        "vectors_mb": reduced_corpus.shape[0] * reduced_corpus.shape[1] * 4 / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and query latency of embedding dimensionality reduction.")
+    parser.add_argument("--vectors", help=".npy file of embeddings (rows = chunks).")
+    parser.add_argument("--source", choices=["spectrum", "corpus"], default="spectrum",
+                        help="Synthetic vectors to use without --vectors.")
+    parser.add_argument("--count", type=int, default=5000, help="Vectors generated by --source spectrum.")
+    parser.add_argument("--input-dim", type=int, default=768, help="Width of --source spectrum vectors.")
+    parser.add_argument("--decay", type=float, default=1.0, help="Spectrum decay exponent of --source spectrum.")
+    parser.add_argument("--pages", type=int, default=1000, help="Corpus size in pages for --source corpus.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200, help="Rows held out as queries.")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--dims", type=int, nargs="+", default=[512, 256, 128, 64, 32])
+    parser.add_argument("--methods", nargs="+", default=["pca", "truncate"], choices=["pca", "truncate"])
+    parser.add_argument("--space", default="l2", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--M", type=int, default=16)
+    parser.add_argument("--construction-ef", type=int, default=100)
+    parser.add_argument("--search-ef", type=int, default=100,
+                        help="Set high by default so index recall mostly reflects the reduction.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    elif args.source == "corpus":
+        vectors = synthetic_vectors(args.pages, args.seed)
+    else:
+        vectors = spectrum_vectors(args.count, args.input_dim, args.decay, args.seed)
+    order = np.random.default_rng(args.seed).permutation(len(vectors))
+    queries, corpus = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    truth = exact_distances(args.space, corpus, queries)
+    print(f"{len(corpus)} indexed vectors of dimension {corpus.shape[1]}, {len(queries)} queries, k={args.k}, "
+          f"space={args.space}, HNSW M={args.M} search_ef={args.search_ef}\n")
+
+    points = [("none", corpus.shape[1])]
+    points += [(method, dim) for method in args.methods for dim in sorted(args.dims, reverse=True)
+               if dim < corpus.shape[1]]
+
+    header = (f"{'method':<9} {'dim':>5} {'fit s':>7} {'var kept':>9} {'exact rec':>10} {'index rec':>10} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'brute ms':>9} {'vectors MB':>11}")
+    print(header)
+    print("-" * len(header))
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        import chromadb
+        client = chromadb.PersistentClient(path=workdir)
+        for method, dim in points:
+            row = evaluate(client, method, dim, corpus, queries, truth, args)
+            rows.append(row)
+            variance = f"{row['explained_variance']:.3f}" if row["explained_variance"] is not None else "-"
+            print(f"{row['method']:<9} {row['dim']:>5} {row['fit_s']:>7.2f} {variance:>9} {row['exact_recall']:>10.3f} "
+                  f"{row['index_recall']:>10.3f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+                  f"{row['brute_force_ms']:>9.3f} {row['vectors_mb']:>11.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# hnsw_sweep.py
+"""
+Sweeps Chroma's HNSW parameters (space, M, construction_ef, search_ef) and reports, for each combination,
+index build time, recall@k against exact brute-force search and per-query latency, to tune the
+speed/quality trade-off before setting them on ChromaCollectionCreator.
+
+Vectors come from a synthetic corpus embedded with the local stub (default), or from a .npy file of real
+embeddings (one row per chunk). A random subset of rows is held out as queries; the rest is indexed.
+search_ef is fixed when a collection is created, so every combination gets its own collection.
+
+Usage:
+    python benchmarks/hnsw_sweep.py --pages 1000 --M 8 16 32 --search-ef 10 50 100
+    python benchmarks/hnsw_sweep.py --vectors gecko_chunks.npy --space cosine --k 5
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic_pdf import make_corpus
+from stubs import StubEmbeddings
+from run_benchmarks import percentile, _PageSet
+
+from File_uploader import DocumentProcessor
+from integration import ChromaCollectionCreator, hnsw_metadata
+
+
+def synthetic_vectors(pages, seed):
+    """
+    Chunks a synthetic corpus exactly like the app does and embeds the chunks with the stub.
+    """
+    processor = DocumentProcessor()
+    for upload in make_corpus(pages, seed=seed):
+        processor.ingest_uploaded_file(upload)
+    chunks = ChromaCollectionCreator(_PageSet(processor.pages), None).split_pages()
+    return np.asarray(StubEmbeddings().embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+
+
+def exact_distances(space, corpus, queries):
+    """
+    Distances from every query to every corpus vector, as Chroma defines them for each space.
+    """
+    if space == "l2":
+        return ((queries ** 2).sum(1)[:, None] - 2 * queries @ corpus.T + (corpus ** 2).sum(1)[None, :])
+    if space == "ip":
+        return 1.0 - queries @ corpus.T
+    corpus_norm = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+    queries_norm = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    return 1.0 - queries_norm @ corpus_norm.T
+
+
+def recall_at_k(distances, results, k):
+    """
+    Fraction of returned ids that belong to the exact top-k. Results tied with the k-th exact distance count
+    as hits, so ties in the corpus don't penalize the index.
+    """
+    hits = 0
+    for row, ids in zip(distances, results):
+        kth = np.partition(row, k - 1)[k - 1]
+        hits += sum(1 for i in ids[:k] if row[int(i)] <= kth + 1e-6)
+    return hits / (k * len(results))
+
+
+def run_point(client, corpus, queries, distances, params, k, batch_size):
+    name = "sweep-{space}-{M}-{construction_ef}-{search_ef}".format(**params)
+    collection = client.create_collection(name, metadata=hnsw_metadata(**params))
+
+    start = time.perf_counter()
+    for i in range(0, len(corpus), batch_size):
+        collection.add(ids=[str(j) for j in range(i, min(i + batch_size, len(corpus)))],
+                       embeddings=corpus[i:i + batch_size].tolist())
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    results = []
+    for query in queries:
+        t0 = time.perf_counter()
+        results.append(collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0])
+        latencies.append(time.perf_counter() - t0)
+
+    client.delete_collection(name)
+    return dict(params, build_s=build_seconds, recall=recall_at_k(distances, results, k),
+                p50_ms=percentile(latencies, 50) * 1000, p95_ms=percentile(latencies, 95) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latency sweep over Chroma HNSW parameters.")
+    parser.add_argument("--vectors", help=".npy file of embeddings (rows = chunks). Default: synthetic corpus.")
+    parser.add_argument("--pages", type=int, default=1000, help="Synthetic corpus size in pages.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200, help="Rows held out as queries.")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--space", nargs="+", default=["l2"], choices=["l2", "cosine", "ip"])
+    parser.add_argument("--M", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--batch-size", type=int, default=1000, help="Vectors per collection.add call.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    vectors = np.load(args.vectors).astype(np.float32) if args.vectors else synthetic_vectors(args.pages, args.seed)
+    order = np.random.default_rng(args.seed).permutation(len(vectors))
+    queries, corpus = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    print(f"{len(corpus)} indexed vectors of dimension {corpus.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        import chromadb
+        client = chromadb.PersistentClient(path=workdir)
+        for space in args.space:
+            # Brute-force reference: exact distances, timed per query
+            start = time.perf_counter()
+            distances = exact_distances(space, corpus, queries)
+            brute_ms = (time.perf_counter() - start) / len(queries) * 1000
+            print(f"\nspace={space}: brute force {brute_ms:.2f} ms/query (numpy, all queries in one batch)")
+            print(f"{'M':>4} {'constr_ef':>9} {'search_ef':>9} {'build s':>8} {f'recall@{args.k}':>9} "
+                  f"{'p50 ms':>8} {'p95 ms':>8}")
+            for M, construction_ef, search_ef in itertools.product(args.M, args.construction_ef, args.search_ef):
+                params = {"space": space, "M": M, "construction_ef": construction_ef, "search_ef": search_ef}
+                row = run_point(client, corpus, queries, distances, params, args.k, args.batch_size)
+                row["brute_force_ms"] = brute_ms
+                rows.append(row)
+                print(f"{M:>4} {construction_ef:>9} {search_ef:>9} {row['build_s']:>8.2f} {row['recall']:>9.3f} "
+                      f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
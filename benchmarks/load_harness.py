@@ -0,0 +1,322 @@
+# load_harness.py
+"""
+Concurrent-session load test: how many simultaneous learners can one quizzify.py process serve?
+
+Each simulated session does what a learner does in the app, in its own thread:
+    upload (DocumentProcessor) -> build collection (ChromaCollectionCreator) -> generate quiz (QuizGenerator,
+    stored in a QuizStore) -> navigate (QuizManager.get_question_at_index / next_question_index)
+All sessions share what a Streamlit process shares: the Chroma client, the embedding client, the LLM, the
+request scheduler and the quiz store. Vertex AI is replaced by the stubs in stubs.py, with injectable latency,
+latency tail (jitter) and error rates.
+
+The load is stepped through increasing session counts; every level starts with a fresh scheduler, so queues
+and counters don't leak between levels. For each level the report shows throughput, end-to-end and per-stage
+p50/p95/p99 latency, and how many sessions failed in which stage.
+
+Usage:
+    python benchmarks/load_harness.py --sessions 1 2 4 8 16 --embed-latency 0.2 --llm-latency 1.0 --jitter 0.3
+    python benchmarks/load_harness.py --sessions 4 16 --llm-error-rate 0.05 --real-quotas
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections.abc import MutableMapping
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic_pdf import make_pdf, InMemoryUpload
+from stubs import (StubEmbeddings, StubLLM, SimulatedFaults, STUB_EMBEDDING_MODEL, STUB_LLM_MODEL,
+                   QUOTA_ERROR, SERVER_ERROR, configure_scheduler_for_stubs)
+from run_benchmarks import percentile, peak_rss_mb
+
+import ui
+import vertex_scheduler
+from File_uploader import DocumentProcessor
+from vertex_embedding import EmbeddingClient
+from integration import ChromaCollectionCreator
+from quiz_algo import QuizGenerator
+from quiz_store import QuizStore
+
+STAGES = ["upload", "build", "generate", "navigate"]
+
+
+class ThreadLocalSessionState(MutableMapping):
+    """
+    Stand-in for st.session_state with one state per thread, i.e. per simulated session.
+    (Outside `streamlit run`, st.session_state is a single dict shared by every thread.)
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def _state(self):
+        if not hasattr(self._local, "state"):
+            self._local.state = {}
+        return self._local.state
+
+    def __getitem__(self, key):
+        return self._state()[key]
+
+    def __setitem__(self, key, value):
+        self._state()[key] = value
+
+    def __delitem__(self, key):
+        del self._state()[key]
+
+    def __iter__(self):
+        return iter(self._state())
+
+    def __len__(self):
+        return len(self._state())
+
+
+class SessionFailed(Exception):
+    def __init__(self, stage, reason):
+        super().__init__(f"{stage}: {reason}")
+        self.stage = stage
+        self.reason = reason
+
+
+class Environment:
+    """
+    The resources one Streamlit process shares between its sessions.
+    """
+    def __init__(self, args, workdir):
+        self.args = args
+        self.persist_directory = os.path.join(workdir, "chroma_db")
+        self.store = QuizStore(os.path.join(workdir, "quiz_store.sqlite3"))
+        error = QUOTA_ERROR if args.error_kind == "quota" else SERVER_ERROR
+        self.embed_faults = SimulatedFaults(args.jitter, args.embed_error_rate, error, seed=args.seed)
+        self.llm_faults = SimulatedFaults(args.jitter, args.llm_error_rate, error, seed=args.seed + 1)
+        self.embed_client = EmbeddingClient(STUB_EMBEDDING_MODEL, None, client=StubEmbeddings(
+            latency=args.embed_latency, per_text_latency=args.embed_per_text_latency, faults=self.embed_faults
+        ))
+        self.llm = StubLLM(latency=args.llm_latency, faults=self.llm_faults)
+        self.uploads = {}
+
+    def upload_for(self, session):
+        # Every learner uploads a different PDF; build them up front so PDF generation isn't measured
+        if session not in self.uploads:
+            self.uploads[session] = InMemoryUpload(
+                f"session-{session}.pdf", make_pdf(self.args.pages, seed=self.args.seed + session)
+            )
+        return self.uploads[session]
+
+
+def run_session(env, level, session, session_state):
+    """
+    One learner's walk through the app. Returns {"timings": {stage: seconds}, "questions", "failed", "error"}.
+    """
+    args = env.args
+    session_state.clear()
+    result = {"timings": {}, "navigate_ms": [], "questions": 0, "failed": None, "error": None}
+    start = time.perf_counter()
+    try:
+        # 1) Upload
+        t0 = time.perf_counter()
+        processor = DocumentProcessor()
+        processor.ingest_uploaded_file(env.upload_for(session))
+        result["timings"]["upload"] = time.perf_counter() - t0
+        if not processor.pages:
+            raise SessionFailed("upload", "no pages extracted")
+
+        # 2) Build the collection (one per session unless --shared-collection, which is what quizzify.py does)
+        t0 = time.perf_counter()
+        collection_name = "langchain" if args.shared_collection else f"load-{level}-{session}"
+        creator = ChromaCollectionCreator(processor, env.embed_client, env.persist_directory, collection_name)
+        creator.create_chroma_collection()
+        result["timings"]["build"] = time.perf_counter() - t0
+        if creator.db is None:
+            raise SessionFailed("build", "collection was not created")
+
+        # 3) Generate the quiz into the store, as the app does
+        t0 = time.perf_counter()
+        generator = QuizGenerator(args.topic, args.questions, creator)
+        generator.llm = env.llm
+        generator.llm_model_name = STUB_LLM_MODEL
+        quiz_id = env.store.create_quiz(args.topic, args.questions)
+        try:
+            for question in generator.iter_questions():
+                env.store.append_question(quiz_id, question)
+        except Exception as e:
+            env.store.finish_quiz(quiz_id, error=str(e))
+            raise SessionFailed("generate", str(e))
+        env.store.finish_quiz(quiz_id)
+        result["questions"] = len(generator.question_bank)
+        result["timings"]["generate"] = time.perf_counter() - t0
+        if not generator.question_bank:
+            raise SessionFailed("generate", "no questions generated")
+
+        # 4) Navigate: read the current question, move to the next one (one Streamlit rerun each)
+        t0 = time.perf_counter()
+        quiz_manager = ui.QuizManager(store=env.store, quiz_id=quiz_id)
+        session_state["question_index"] = 0
+        for _ in range(args.navigations):
+            step = time.perf_counter()
+            quiz_manager.get_question_at_index(session_state["question_index"])
+            quiz_manager.next_question_index(direction=1)
+            result["navigate_ms"].append((time.perf_counter() - step) * 1000)
+        result["timings"]["navigate"] = time.perf_counter() - t0
+
+    except SessionFailed as e:
+        result["failed"], result["error"] = e.stage, e.reason
+    except Exception as e:
+        stage = next((s for s in STAGES if s not in result["timings"]), "navigate")
+        result["failed"], result["error"] = stage, f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_level(env, level, session_state):
+    """
+    Runs `level` sessions concurrently (each repeating the flow --rounds times) with a fresh scheduler.
+    """
+    args = env.args
+    # A fresh process-wide scheduler per level, as in a freshly started deployment
+    if vertex_scheduler._scheduler is not None:
+        vertex_scheduler._scheduler.shutdown()
+    vertex_scheduler._scheduler = vertex_scheduler.RequestScheduler(max_in_flight=args.max_in_flight)
+    configure_scheduler_for_stubs(vertex_scheduler.get_scheduler(), real_quotas=args.real_quotas)
+    faults_before = (env.embed_faults.errors, env.llm_faults.errors)
+
+    for session in range(level):
+        env.upload_for(session)
+
+    results = []
+    results_lock = threading.Lock()
+    barrier = threading.Barrier(level)
+
+    def learner(session):
+        barrier.wait()
+        for _ in range(args.rounds):
+            result = run_session(env, level, session, session_state)
+            with results_lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=learner, args=(session,)) for session in range(level)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["failed"] is None]
+    failures = {}
+    for r in results:
+        if r["failed"]:
+            failures[r["failed"]] = failures.get(r["failed"], 0) + 1
+    scheduler_metrics = vertex_scheduler.get_scheduler().metrics()
+    interactive_wait = scheduler_metrics["wait_seconds_by_priority"].get(vertex_scheduler.INTERACTIVE, {})
+
+    report = {
+        "sessions": level,
+        "attempts": len(results),
+        "ok": len(ok),
+        "failure_rate": 1 - len(ok) / len(results) if results else 0.0,
+        "failures_by_stage": failures,
+        "errors": sorted({r["error"] for r in results if r["error"]})[:5],
+        "wall_seconds": wall,
+        "sessions_per_min": len(ok) / wall * 60 if wall > 0 else 0.0,
+        "questions_per_s": sum(r["questions"] for r in results) / wall if wall > 0 else 0.0,
+        "e2e_s": {p: percentile([r["seconds"] for r in ok], p) for p in (50, 95, 99)},
+        "stages": {},
+        "injected_errors": {"embed": env.embed_faults.errors - faults_before[0],
+                            "llm": env.llm_faults.errors - faults_before[1]},
+        "scheduler_retried": scheduler_metrics["retried"],
+        "interactive_wait_p95_s": interactive_wait.get("p95", 0.0),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    for stage in STAGES:
+        if stage == "navigate":
+            values = [ms / 1000 for r in results for ms in r["navigate_ms"]]
+        else:
+            values = [r["timings"][stage] for r in results if stage in r["timings"]]
+        report["stages"][stage] = {p: percentile(values, p) for p in (50, 95, 99)}
+    return report
+
+
+def print_report(reports):
+    header = (f"{'sessions':>8} {'ok':>5} {'fail %':>7} {'sess/min':>9} {'q/s':>7} {'e2e p50 s':>10} "
+              f"{'e2e p95 s':>10} {'e2e p99 s':>10} {'retries':>8} {'wait p95 s':>11} {'peak MB':>8}")
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        print(f"{r['sessions']:>8} {r['ok']:>5} {r['failure_rate'] * 100:>7.1f} {r['sessions_per_min']:>9.1f} "
+              f"{r['questions_per_s']:>7.2f} {r['e2e_s'][50]:>10.2f} {r['e2e_s'][95]:>10.2f} {r['e2e_s'][99]:>10.2f} "
+              f"{r['scheduler_retried']:>8} {r['interactive_wait_p95_s']:>11.2f} {r['peak_rss_mb']:>8.1f}")
+
+    print("\nPer-stage latency p50 / p95 / p99 (navigate in ms, other stages in s):")
+    print(f"{'sessions':>8} " + " ".join(f"{stage:>24}" for stage in STAGES))
+    for r in reports:
+        cells = []
+        for stage in STAGES:
+            scale, fmt = (1000, ".2f") if stage == "navigate" else (1, ".2f")
+            values = [format(r["stages"][stage][p] * scale, fmt) for p in (50, 95, 99)]
+            cells.append(f"{' / '.join(values):>24}")
+        print(f"{r['sessions']:>8} " + " ".join(cells))
+
+    failing = [r for r in reports if r["failures_by_stage"]]
+    if failing:
+        print("\nFailures:")
+        for r in failing:
+            stages = ", ".join(f"{stage} {count}" for stage, count in r["failures_by_stage"].items())
+            print(f"  {r['sessions']:>4} sessions: {stages} (injected errors: embed {r['injected_errors']['embed']}, "
+                  f"llm {r['injected_errors']['llm']}); e.g. {r['errors'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the Quizzify pipeline.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Concurrent session counts to step through.")
+    parser.add_argument("--rounds", type=int, default=1, help="Times each session repeats the whole flow.")
+    parser.add_argument("--pages", type=int, default=10, help="Pages of each session's PDF.")
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--navigations", type=int, default=10, help="Question navigations per session.")
+    parser.add_argument("--topic", default="photosynthesis")
+    parser.add_argument("--shared-collection", action="store_true",
+                        help="All sessions write to one 'langchain' collection, as quizzify.py currently does.")
+    parser.add_argument("--embed-latency", type=float, default=0.1, help="Simulated seconds per embedding call.")
+    parser.add_argument("--embed-per-text-latency", type=float, default=0.002,
+                        help="Simulated seconds per embedded text.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Simulated seconds per LLM call.")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Mean extra latency per call (exponential tail), in seconds.")
+    parser.add_argument("--embed-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--error-kind", choices=["quota", "server"], default="quota",
+                        help="quota errors (429) are retried by the scheduler, server errors (500) are not.")
+    parser.add_argument("--real-quotas", action="store_true",
+                        help="Apply the Vertex AI models' rate limits to the stubs instead of lifting them.")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Scheduler cap on concurrent calls per model (default: rate limits only).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own progress output.")
+    args = parser.parse_args()
+
+    # QuizManager reads st.session_state; give every simulated session its own
+    session_state = ThreadLocalSessionState()
+    ui.st = types.SimpleNamespace(session_state=session_state)
+
+    reports = []
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, "w") as devnull:
+        env = Environment(args, workdir)
+        for level in sorted(args.sessions):
+            print(f"Running {level} concurrent sessions...", file=sys.stderr)
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                reports.append(run_level(env, level, session_state))
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# run_benchmarks.py
+"""
+Offline end-to-end benchmark of the quiz pipeline:
+    parse (DocumentProcessor) -> chunk (split_pages) -> embed (EmbeddingClient) -> index (Chroma)
+    -> query (query_chroma_collection) -> generate (QuizGenerator.generate_quiz)
+
+Vertex AI is replaced by the deterministic stand-ins in stubs.py, so no credentials are needed.
+The suite runs over synthetic PDF corpora of increasing size and reports throughput, p50/p95/p99
+latencies and the RSS peak and growth of each stage. A baseline can be saved and later runs are compared against it.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 10 50 200 --save-baseline
+    python benchmarks/run_benchmarks.py --sizes 10 50 200          # compares with the saved baseline
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic_pdf import make_corpus, VOCABULARY
+from stubs import StubEmbeddings, StubLLM, STUB_EMBEDDING_MODEL, STUB_LLM_MODEL, configure_scheduler_for_stubs
+
+from File_uploader import DocumentProcessor, current_rss_bytes
+from vertex_embedding import EmbeddingClient
+from integration import ChromaCollectionCreator
+from quiz_algo import QuizGenerator
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STAGES = ["parse", "chunk", "embed", "index", "query", "generate"]
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (ru_maxrss is KB on Linux, bytes on macOS).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class StageMemory:
+    """
+    Samples this process's RSS from a background thread while a stage runs, so each stage reports its own
+    peak (ru_maxrss only gives the peak of the whole process so far) and how much memory it left behind.
+    """
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_bytes = self.peak_bytes = self.end_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+    def __enter__(self):
+        self.start_bytes = self.peak_bytes = current_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_bytes = current_rss_bytes()
+        self.peak_bytes = max(self.peak_bytes, self.end_bytes)
+        return False
+
+
+def summarize(latencies, items, total_seconds, memory):
+    """
+    latencies: Per-operation latencies in seconds.
+    items: Number of units processed (pages, chunks, queries, questions).
+    total_seconds: Wall-clock time of the whole stage.
+    memory: StageMemory the stage ran under.
+    """
+    return {
+        "items": items,
+        "seconds": total_seconds,
+        "throughput": items / total_seconds if total_seconds > 0 else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_mb": memory.peak_bytes / (1024 * 1024),
+        "rss_growth_mb": (memory.end_bytes - memory.start_bytes) / (1024 * 1024),
+    }
+
+
+class _PageSet:
+    """
+    Minimal stand-in for DocumentProcessor exposing only `pages`, used to chunk one document at a time.
+    """
+    def __init__(self, pages):
+        self.pages = pages
+
+
+class PrecomputedEmbeddings:
+    """
+    Returns document vectors computed in the embed stage, so the index stage measures Chroma alone.
+    Queries (and unseen texts) fall back to the wrapped stub.
+    """
+    def __init__(self, vectors, fallback):
+        self.vectors = vectors
+        self.fallback = fallback
+
+    def embed_documents(self, texts):
+        missing = [t for t in texts if t not in self.vectors]
+        if missing:
+            self.vectors.update(zip(missing, self.fallback.embed_documents(missing)))
+        return [self.vectors[t] for t in texts]
+
+    def embed_query(self, text):
+        return self.fallback.embed_query(text)
+
+
+def run_corpus(total_pages, args, workdir):
+    stages = {}
+    uploads = make_corpus(total_pages, pages_per_doc=args.pages_per_doc, seed=args.seed)
+    stub_embeddings = StubEmbeddings(latency=args.embed_latency, per_text_latency=args.embed_per_text_latency)
+    embed_client = EmbeddingClient(STUB_EMBEDDING_MODEL, None, client=stub_embeddings)
+
+    # 1) Parse: one latency per PDF
+    processor = DocumentProcessor()
+    latencies = []
+    pages_per_upload = []
+    with StageMemory() as memory:
+        start = time.perf_counter()
+        for upload in uploads:
+            t0 = time.perf_counter()
+            pages_per_upload.append(processor.ingest_uploaded_file(upload))
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+    stages["parse"] = summarize(latencies, len(processor.pages), elapsed, memory)
+
+    # 2) Chunk: one latency per PDF
+    latencies = []
+    chunks = []
+    with StageMemory() as memory:
+        start = time.perf_counter()
+        for pages in pages_per_upload:
+            t0 = time.perf_counter()
+            chunks.extend(ChromaCollectionCreator(_PageSet(pages), embed_client).split_pages())
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+    stages["chunk"] = summarize(latencies, len(chunks), elapsed, memory)
+
+    # 3) Embed: one latency per batch of chunk texts
+    texts = [chunk.page_content for chunk in chunks]
+    vectors = {}
+    latencies = []
+    with StageMemory() as memory:
+        start = time.perf_counter()
+        for i in range(0, len(texts), args.batch_size):
+            batch = texts[i:i + args.batch_size]
+            t0 = time.perf_counter()
+            vectors.update(zip(batch, embed_client.embed_documents(batch)))
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+    stages["embed"] = summarize(latencies, len(texts), elapsed, memory)
+
+    # 4) Index: build the Chroma collection from the precomputed vectors
+    index_client = EmbeddingClient(STUB_EMBEDDING_MODEL, None, client=PrecomputedEmbeddings(vectors, stub_embeddings))
+    creator = ChromaCollectionCreator(
+        processor,
+        index_client,
+        persist_directory=os.path.join(workdir, f"chroma_{total_pages}"),
+        collection_name=f"bench_{total_pages}"
+    )
+    with StageMemory() as memory:
+        start = time.perf_counter()
+        creator.create_chroma_collection()
+        elapsed = time.perf_counter() - start
+    stages["index"] = summarize([elapsed], len(chunks), elapsed, memory)
+
+    # 5) Query: one latency per query
+    queries = [" ".join(VOCABULARY[(i * 7 + j) % len(VOCABULARY)] for j in range(3)) for i in range(args.queries)]
+    latencies = []
+    with StageMemory() as memory:
+        start = time.perf_counter()
+        for query in queries:
+            t0 = time.perf_counter()
+            creator.query_chroma_collection(query, k=args.k)
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+    stages["query"] = summarize(latencies, len(queries), elapsed, memory)
+
+    # 6) Generate: one latency per validated question
+    generator = QuizGenerator("photosynthesis", args.questions, creator)
+    generator.llm = StubLLM(latency=args.llm_latency)
+    generator.llm_model_name = STUB_LLM_MODEL
+    latencies = []
+    with StageMemory() as memory:
+        start = time.perf_counter()
+        t0 = start
+        for _ in generator.iter_questions():
+            now = time.perf_counter()
+            latencies.append(now - t0)
+            t0 = now
+        elapsed = time.perf_counter() - start
+    stages["generate"] = summarize(latencies, len(generator.question_bank), elapsed, memory)
+
+    return stages
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a list of human-readable regressions: p95 latency above, or throughput below,
+    the baseline by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(size, {}).get(stage)
+            if not previous:
+                continue
+            if previous["p95_ms"] > 0 and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{size} pages / {stage}: p95 {current['p95_ms']:.1f} ms vs baseline {previous['p95_ms']:.1f} ms"
+                )
+            if previous["throughput"] > 0 and current["throughput"] < previous["throughput"] * (1 - tolerance):
+                regressions.append(
+                    f"{size} pages / {stage}: throughput {current['throughput']:.1f}/s vs baseline {previous['throughput']:.1f}/s"
+                )
+    return regressions
+
+
+def print_table(results):
+    header = f"{'pages':>6} {'stage':<9} {'items':>7} {'items/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8} {'+MB':>7}"
+    print(header)
+    print("-" * len(header))
+    for size, stages in results.items():
+        for stage in STAGES:
+            r = stages[stage]
+            print(f"{size:>6} {stage:<9} {r['items']:>7} {r['throughput']:>10.1f} {r['p50_ms']:>9.2f} "
+                  f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['peak_rss_mb']:>8.1f} "
+                  f"{r['rss_growth_mb']:>+7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the Quizzify pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="Corpus sizes in pages.")
+    parser.add_argument("--pages-per-doc", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=32, help="Chunks per embed_documents call.")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Simulated seconds per embedding call.")
+    parser.add_argument("--embed-per-text-latency", type=float, default=0.0, help="Simulated seconds per embedded text.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression as a fraction (0.2 = 20%%).")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    configure_scheduler_for_stubs()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sorted(args.sizes):
+            results[str(size)] = run_corpus(size, args, workdir)
+
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
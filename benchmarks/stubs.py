@@ -0,0 +1,158 @@
+# stubs.py
+"""
+Deterministic local stand-ins for the Vertex AI embedding model and Gemini, with configurable simulated latency
+(fixed plus an optional random tail) and injectable errors.
+"""
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+import numpy as np
+
+STUB_EMBEDDING_MODEL = "stub-embedding"
+STUB_LLM_MODEL = "stub-llm"
+
+# Injected errors look like Vertex AI's quota errors by default, so the request scheduler retries them;
+# use SERVER_ERROR for failures that are not retried.
+QUOTA_ERROR = "429 Resource exhausted (simulated)"
+SERVER_ERROR = "500 Internal error (simulated)"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _token_index(token, dim):
+    digest = hashlib.md5(token.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "little") % dim
+
+
+class SimulatedFaults:
+    """
+    Simulated network behaviour shared by the stubs: a random latency tail and random failures.
+    """
+    def __init__(self, jitter=0.0, error_rate=0.0, error=QUOTA_ERROR, seed=None):
+        """
+        jitter: Mean of an exponentially distributed extra delay per call, in seconds (a long tail, like a real API).
+        error_rate: Probability that a call raises RuntimeError(error) after its delay.
+        seed: Seed of the random generator, for reproducible runs.
+        """
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error = error
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def apply(self, delay):
+        with self._lock:
+            self.calls += 1
+            if self.jitter > 0:
+                delay += self._rng.expovariate(1.0 / self.jitter)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise RuntimeError(self.error)
+
+
+class StubEmbeddings:
+    """
+    Replaces VertexAIEmbeddings. Each text becomes a normalized bag-of-hashed-words vector,
+    so the same text always gets the same vector and texts sharing words are close to each other.
+    """
+    def __init__(self, dim=768, latency=0.0, per_text_latency=0.0, faults=None):
+        """
+        dim: Vector width (textembedding-gecko@003 returns 768).
+        latency: Simulated round-trip time per call, in seconds.
+        per_text_latency: Additional simulated time per embedded text, in seconds.
+        faults: Optional SimulatedFaults adding a latency tail and errors.
+        """
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.faults = faults
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            vector[_token_index(token, self.dim)] += 1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def _sleep(self, count):
+        delay = self.latency + self.per_text_latency * count
+        if self.faults is not None:
+            self.faults.apply(delay)
+        elif delay > 0:
+            time.sleep(delay)
+
+    def embed_query(self, text):
+        self._sleep(1)
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        self._sleep(len(texts))
+        return [self._vector(text) for text in texts]
+
+
+class StubLLM:
+    """
+    Replaces the VertexAI LLM. invoke() returns a quiz question in the JSON format the prompt asks for;
+    every call produces a different question so QuizGenerator's uniqueness check passes.
+    """
+    def __init__(self, latency=0.0, faults=None):
+        """
+        latency: Simulated generation time per call, in seconds.
+        faults: Optional SimulatedFaults adding a latency tail and errors.
+        """
+        self.latency = latency
+        self.faults = faults
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt_value):
+        if self.faults is not None:
+            self.faults.apply(self.latency)
+        elif self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            number = next(self._counter)
+        prompt = prompt_value.to_string() if hasattr(prompt_value, "to_string") else str(prompt_value)
+        words = TOKEN_PATTERN.findall(prompt.split("Context:")[-1])[:4] or ["context"]
+        return json.dumps({
+            "question": f"Question {number}: which term relates to {' '.join(words)}?",
+            "choices": [
+                {"key": "A", "value": words[0]},
+                {"key": "B", "value": "none of the above"},
+                {"key": "C", "value": "all of the above"},
+                {"key": "D", "value": "cannot be determined"},
+            ],
+            "answer": "A",
+            "explanation": f"The context mentions {words[0]}.",
+        })
+
+
+def configure_scheduler_for_stubs(scheduler=None, real_quotas=False):
+    """
+    Lifts the scheduler's rate limits for the stub models, so benchmarks measure the pipeline rather than
+    the quota settings. With `real_quotas`, the stubs get the limits of the Vertex AI models they replace.
+    `scheduler` defaults to the process-wide one.
+    """
+    from vertex_scheduler import get_scheduler, DEFAULT_MODEL_LIMITS
+
+    scheduler = scheduler or get_scheduler()
+    if real_quotas:
+        scheduler.configure_model(STUB_EMBEDDING_MODEL, *DEFAULT_MODEL_LIMITS["textembedding-gecko@003"])
+        scheduler.configure_model(STUB_LLM_MODEL, *DEFAULT_MODEL_LIMITS["gemini-pro"])
+    else:
+        scheduler.configure_model(STUB_EMBEDDING_MODEL, rate=1e9, burst=1e9)
+        scheduler.configure_model(STUB_LLM_MODEL, rate=1e9, burst=1e9)
+    return scheduler
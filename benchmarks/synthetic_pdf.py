@@ -0,0 +1,97 @@
+# synthetic_pdf.py
+"""
+Builds deterministic text PDFs in memory, so benchmarks don't depend on real course material.
+"""
+import io
+import random
+
+VOCABULARY = (
+    "photosynthesis chlorophyll mitochondria enzyme protein membrane nucleus osmosis diffusion "
+    "energy molecule reaction catalyst equilibrium entropy gradient voltage current resistance "
+    "algorithm recursion complexity graph vertex matrix vector integral derivative function "
+    "history empire revolution treaty parliament economy market supply demand inflation "
+    "the of and to in is that for as with by on are this be from at which an was"
+).split()
+
+
+class InMemoryUpload:
+    """
+    Stand-in for Streamlit's UploadedFile: a file name plus the PDF bytes.
+    """
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.size = len(data)
+
+    def getvalue(self):
+        return self.data
+
+
+def _page_text_lines(rng, lines_per_page, words_per_line):
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(words_per_line)) for _ in range(lines_per_page)]
+
+
+def make_pdf(num_pages, seed=0, lines_per_page=45, words_per_line=12, blank_every=0) -> bytes:
+    """
+    Returns the bytes of a PDF with `num_pages` pages of pseudo-random text (same seed, same PDF).
+    With `blank_every=n`, every n-th page has no text and no fonts, like a scanned image-only page.
+    """
+    rng = random.Random(seed)
+    objects = []  # Object bodies; object number = index + 1
+
+    # 1: catalog, 2: page tree, 3: font; pages and their content streams follow.
+    page_ids = [4 + 2 * i for i in range(num_pages)]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for number, pid in enumerate(page_ids, start=1):
+        if blank_every and number % blank_every == 0:
+            objects.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << >> /Contents {pid + 1} 0 R >>".encode()
+            )
+            objects.append(b"<< /Length 0 >>\nstream\n\nendstream")
+            continue
+        lines = _page_text_lines(rng, lines_per_page, words_per_line)
+        stream = ["BT /F1 10 Tf 12 TL 50 780 Td"]
+        for line in lines:
+            stream.append(f"({line}) Tj T*")
+        stream.append("ET")
+        content = "\n".join(stream).encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    xref_offset = out.tell()
+    out.write(b"xref\n0 %d\n" % (len(objects) + 1))
+    out.write(b"0000000000 65535 f \n")
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return out.getvalue()
+
+
+def make_corpus(total_pages, pages_per_doc=10, seed=0) -> list:
+    """
+    Returns a list of InMemoryUpload objects adding up to `total_pages` pages.
+    """
+    uploads = []
+    remaining = total_pages
+    doc_index = 0
+    while remaining > 0:
+        pages = min(pages_per_doc, remaining)
+        data = make_pdf(pages, seed=seed + doc_index)
+        uploads.append(InMemoryUpload(f"synthetic_{total_pages}_{doc_index}.pdf", data))
+        remaining -= pages
+        doc_index += 1
+    return uploads
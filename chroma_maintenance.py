@@ -0,0 +1,226 @@
+# chroma_maintenance.py
+"""
+Maintenance commands for a Chroma persist directory (./chroma_db by default):
+
+    python chroma_maintenance.py list                  # collections, sizes and HNSW parameters
+    python chroma_maintenance.py compact [--dry-run]   # drop orphaned segment directories, VACUUM chroma.sqlite3
+    python chroma_maintenance.py rebuild --collection langchain --space cosine --M 32 --search-ef 64
+
+Each HNSW index lives in a segment directory named after its segment ID (header.bin, link_lists.bin,
+index_metadata.pickle, ...). chromadb doesn't remove that directory when a collection is deleted or replaced,
+so repeated runs leave stale indexes behind; `compact` removes every segment directory (named by a UUID) that
+chroma.sqlite3 no longer references and the saved embedding reducers (<collection>.reducer.npz) of deleted
+collections. Other directories and files are left alone.
+HNSW parameters are fixed when a collection is created; `rebuild` copies the stored vectors into a new
+collection with the new parameters (nothing is re-embedded) and then compacts.
+
+Run `compact` while no other process is writing to the directory.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import uuid
+
+from embedding_reducer import REDUCER_METADATA_KEY
+from integration import HNSW_DEFAULTS, get_chroma_client, hnsw_metadata, hnsw_params
+
+SQLITE_FILE = "chroma.sqlite3"
+REDUCER_SUFFIX = ".reducer.npz"
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _connect(persist_directory):
+    path = os.path.join(persist_directory, SQLITE_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No Chroma database at {path}")
+    return sqlite3.connect(path, timeout=30)
+
+
+def referenced_segments(persist_directory):
+    """
+    Returns {segment_id: collection_name} for every segment chroma.sqlite3 knows about.
+    """
+    conn = _connect(persist_directory)
+    try:
+        rows = conn.execute(
+            "SELECT segments.id, collections.name FROM segments LEFT JOIN collections "
+            "ON segments.collection = collections.id"
+        ).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def _is_segment_id(name):
+    try:
+        return str(uuid.UUID(name)) == name
+    except ValueError:
+        return False
+
+
+def find_orphaned_segments(persist_directory):
+    """
+    Segment directories (HNSW index files) that no collection references any more.
+    Only directories named by a segment UUID are considered.
+    """
+    referenced = referenced_segments(persist_directory)
+    return [
+        os.path.join(persist_directory, name)
+        for name in sorted(os.listdir(persist_directory))
+        if os.path.isdir(os.path.join(persist_directory, name)) and _is_segment_id(name) and name not in referenced
+    ]
+
+
+def find_orphaned_reducers(persist_directory):
+    """
+    Saved embedding reducers (<collection>.reducer.npz) whose collection no longer exists.
+    """
+    collections = set(referenced_segments(persist_directory).values())
+    return [
+        os.path.join(persist_directory, name)
+        for name in sorted(os.listdir(persist_directory))
+        if name.endswith(REDUCER_SUFFIX) and name[:-len(REDUCER_SUFFIX)] not in collections
+    ]
+
+
+def list_collections(persist_directory):
+    """
+    One dict per collection: name, number of vectors, HNSW parameters, embedding reducer and index size on disk.
+    """
+    referenced = referenced_segments(persist_directory)
+    client = get_chroma_client(persist_directory)
+    collections = []
+    for name in sorted(client.list_collections()):
+        collection = client.get_collection(name)
+        index_bytes = sum(
+            _directory_size(os.path.join(persist_directory, segment_id))
+            for segment_id, collection_name in referenced.items()
+            if collection_name == name and os.path.isdir(os.path.join(persist_directory, segment_id))
+        )
+        collections.append({"name": name, "vectors": collection.count(), "index_bytes": index_bytes,
+                            "reducer": (collection.metadata or {}).get(REDUCER_METADATA_KEY),
+                            **hnsw_params(collection.metadata)})
+    return collections
+
+
+def compact(persist_directory, dry_run=False, vacuum=True):
+    """
+    Removes orphaned segment directories and reducer files and (unless `vacuum` is False) VACUUMs chroma.sqlite3.
+    Returns a report with the removed paths and the bytes freed.
+    """
+    orphaned = find_orphaned_segments(persist_directory) + find_orphaned_reducers(persist_directory)
+    freed = sum(_directory_size(path) if os.path.isdir(path) else os.path.getsize(path) for path in orphaned)
+    report = {"orphaned": orphaned, "freed_bytes": freed, "sqlite_freed_bytes": 0, "dry_run": dry_run}
+    if dry_run:
+        return report
+
+    for path in orphaned:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+
+    if vacuum:
+        sqlite_path = os.path.join(persist_directory, SQLITE_FILE)
+        before = os.path.getsize(sqlite_path)
+        conn = _connect(persist_directory)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        report["sqlite_freed_bytes"] = before - os.path.getsize(sqlite_path)
+    return report
+
+
+def rebuild_collection(persist_directory, collection_name, batch_size=1000, **params):
+    """
+    Recreates `collection_name` with new HNSW parameters (missing ones keep their current value),
+    copying ids, vectors, documents and metadata in batches. Returns the number of vectors copied.
+    """
+    client = get_chroma_client(persist_directory)
+    old = client.get_collection(collection_name)
+    new_params = dict(hnsw_params(old.metadata), **params)
+    metadata = dict(old.metadata or {}, **hnsw_metadata(**new_params))
+
+    # Build under a temporary name, then swap, so a failed rebuild leaves the original untouched
+    temp_name = f"{collection_name[:50]}-rebuild-tmp"
+    if temp_name in client.list_collections():
+        client.delete_collection(temp_name)
+    new = client.create_collection(temp_name, metadata=metadata)
+
+    copied = 0
+    while True:
+        batch = old.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=copied)
+        if not batch["ids"]:
+            break
+        new.add(ids=batch["ids"], embeddings=batch["embeddings"], documents=batch["documents"],
+                metadatas=batch["metadatas"])
+        copied += len(batch["ids"])
+        print(f"Copied {copied} vectors")
+
+    client.delete_collection(collection_name)
+    new.modify(name=collection_name)
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, compact and rebuild a Chroma persist directory.")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="Show collections, vector counts, index sizes and HNSW parameters.")
+
+    compact_parser = commands.add_parser("compact", help="Drop orphaned segment directories and VACUUM.")
+    compact_parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed.")
+    compact_parser.add_argument("--no-vacuum", action="store_true", help="Skip VACUUM of chroma.sqlite3.")
+
+    rebuild_parser = commands.add_parser("rebuild", help="Recreate a collection with new HNSW parameters.")
+    rebuild_parser.add_argument("--collection", required=True)
+    rebuild_parser.add_argument("--space", choices=["l2", "cosine", "ip"])
+    rebuild_parser.add_argument("--M", type=int, help=f"Default {HNSW_DEFAULTS['M']}.")
+    rebuild_parser.add_argument("--construction-ef", type=int, help=f"Default {HNSW_DEFAULTS['construction_ef']}.")
+    rebuild_parser.add_argument("--search-ef", type=int, help=f"Default {HNSW_DEFAULTS['search_ef']}.")
+    rebuild_parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.persist_directory, SQLITE_FILE)):
+        print(f"{args.persist_directory} is not a Chroma persist directory (no {SQLITE_FILE})")
+        return 1
+
+    if args.command == "list":
+        for c in list_collections(args.persist_directory):
+            print(f"{c['name']:<40} {c['vectors']:>8} vectors {c['index_bytes'] / 1e6:>9.1f} MB  "
+                  f"space={c['space']} M={c['M']} construction_ef={c['construction_ef']} search_ef={c['search_ef']}"
+                  f" reducer={c['reducer'] or 'none'}")
+        return 0
+
+    if args.command == "rebuild":
+        params = {"space": args.space, "M": args.M, "construction_ef": args.construction_ef,
+                  "search_ef": args.search_ef}
+        params = {name: value for name, value in params.items() if value is not None}
+        copied = rebuild_collection(args.persist_directory, args.collection, args.batch_size, **params)
+        print(f"Rebuilt '{args.collection}' with {copied} vectors")
+
+    report = compact(args.persist_directory, dry_run=getattr(args, "dry_run", False),
+                     vacuum=not getattr(args, "no_vacuum", False))
+    verb = "Would remove" if report["dry_run"] else "Removed"
+    for path in report["orphaned"]:
+        print(f"{verb} {path}")
+    print(f"{verb} {len(report['orphaned'])} orphaned segment directories / reducer files "
+          f"({report['freed_bytes'] / 1e6:.1f} MB)")
+    if not report["dry_run"]:
+        print(f"VACUUM freed {report['sqlite_freed_bytes'] / 1e6:.1f} MB of chroma.sqlite3")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
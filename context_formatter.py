@@ -0,0 +1,107 @@
+import math
+
+
+class ContextFormatter:
+    """
+    Turns the retriever's list of Documents into the plain text that fills the {context} slot of the quiz prompt:
+      - renders only page_content (no Document repr, no metadata dicts)
+      - removes the regions that neighbouring chunks share because of the splitter's chunk_overlap
+      - packs chunks in relevance order until the token budget is used up
+    """
+    def __init__(self, token_budget=1500, chars_per_token=4, max_overlap=200, min_overlap=20, separator="\n\n"):
+        """
+        token_budget: Maximum number of (estimated) tokens the packed context may use.
+        chars_per_token: Rough characters-per-token ratio used to estimate token counts without a tokenizer call.
+        max_overlap: Largest overlap (in characters) to look for between two chunks; matches CharacterTextSplitter's chunk_overlap.
+        min_overlap: Shortest overlap (in characters) that is stripped; shorter matches are treated as coincidence.
+        separator: String placed between packed chunks.
+        """
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.max_overlap = max_overlap
+        self.min_overlap = min_overlap
+        self.separator = separator
+        self.last_report = None  # Stats of the most recent format_documents() call.
+
+    def estimate_tokens(self, text):
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def _overlap_sizes(self, text):
+        """
+        Candidate overlap lengths for `text`, longest first. CharacterTextSplitter(separator="\n") only carries
+        whole lines into the next chunk, so an overlap always ends (as a prefix) or starts (as a suffix) at a
+        line break.
+        """
+        breaks = [i for i, char in enumerate(text) if char == "\n"]
+        prefixes = [i for i in breaks if self.min_overlap <= i <= self.max_overlap]
+        suffixes = [len(text) - i - 1 for i in breaks if self.min_overlap <= len(text) - i - 1 <= self.max_overlap]
+        return sorted(prefixes, reverse=True), sorted(suffixes, reverse=True)
+
+    def _strip_overlap(self, text, packed_texts):
+        """
+        Removes the part of `text` that is already present in one of the packed chunks:
+          - the whole chunk if it is contained in a packed chunk
+          - a prefix of whole lines that repeats the last lines of a packed chunk
+          - a suffix of whole lines that repeats the first lines of a packed chunk
+        """
+        for packed in packed_texts:
+            if text in packed:
+                return ""
+
+        for packed in packed_texts:
+            prefixes, _ = self._overlap_sizes(text)
+            for size in prefixes:
+                if packed.endswith(text[:size]) and (len(packed) == size or packed[-size - 1] == "\n"):
+                    text = text[size:].lstrip("\n")
+                    break
+            _, suffixes = self._overlap_sizes(text)
+            for size in suffixes:
+                if packed.startswith(text[-size:]) and (len(packed) == size or packed[size] == "\n"):
+                    text = text[:-size].rstrip("\n")
+                    break
+        return text.strip()
+
+    def format_documents(self, docs):
+        """
+        Returns the packed context string for a list of Documents (as returned by a retriever).
+        """
+        docs = docs or []
+        raw_tokens = self.estimate_tokens(str(docs))
+
+        # Chunks from the same page are the only ones that can share splitter overlap.
+        packed_by_page = {}
+        parts = []
+        used_tokens = 0
+        separator_tokens = self.estimate_tokens(self.separator)
+        dropped = 0
+
+        for doc in docs:
+            meta = getattr(doc, "metadata", None) or {}
+            page_key = (meta.get("pdf_uuid", meta.get("source")), meta.get("page"))
+            page_texts = packed_by_page.setdefault(page_key, [])
+
+            text = self._strip_overlap(doc.page_content.strip(), page_texts)
+            if not text:
+                continue
+
+            cost = self.estimate_tokens(text) + (separator_tokens if parts else 0)
+            if used_tokens + cost > self.token_budget:
+                dropped += 1
+                continue
+
+            # Keep the full chunk for later overlap checks, but only render the new text.
+            page_texts.append(doc.page_content)
+            parts.append(text)
+            used_tokens += cost
+
+        context = self.separator.join(parts)
+        packed_tokens = self.estimate_tokens(context)
+        self.last_report = {
+            "documents": len(docs),
+            "packed_chunks": len(parts),
+            "dropped_chunks": dropped,
+            "raw_tokens": raw_tokens,
+            "packed_tokens": packed_tokens,
+            "saved_tokens": max(raw_tokens - packed_tokens, 0),
+        }
+        return context
@@ -0,0 +1,136 @@
+# embedding_reducer.py
+"""
+Optional dimensionality reduction between EmbeddingClient and the Chroma collection.
+
+Smaller vectors make the HNSW index smaller and every distance computation cheaper. Two reducers:
+  - PCAReducer:        projects onto the top principal components of the collection's own chunks
+  - TruncationReducer: keeps the first `dim` coordinates and re-normalizes (only sensible for embedding
+                       models trained to keep most information in the leading dimensions)
+A reducer is described by a spec string, "pca:<dim>" or "truncate:<dim>". The same reducer has to be applied
+to documents and queries, so it is saved next to the collection (<collection>.reducer.npz) and the spec is
+recorded in the collection's metadata under "embedding_reducer".
+"""
+import os
+
+import numpy as np
+
+REDUCER_METADATA_KEY = "embedding_reducer"
+
+
+class PCAReducer:
+    kind = "pca"
+
+    def __init__(self, dim):
+        """
+        dim: Output dimension. If the corpus has fewer chunks than `dim`, the missing components are zero,
+             so the output width is always `dim`.
+        """
+        self.dim = dim
+        self.mean = None
+        self.components = None  # (dim, input_dim)
+        self.explained_variance = None  # Fraction of the corpus variance kept
+
+    @property
+    def fitted(self):
+        return self.components is not None
+
+    def describe(self):
+        return f"{self.kind}:{self.dim}"
+
+    def fit(self, vectors):
+        """
+        Fits the projection on the corpus vectors. Uses the (input_dim x input_dim) covariance matrix,
+        so memory doesn't grow with the number of chunks beyond the vectors themselves.
+        """
+        X = np.asarray(vectors, dtype=np.float64)
+        if X.shape[1] < self.dim:
+            raise ValueError(f"Cannot reduce {X.shape[1]}-dimensional embeddings to {self.dim} dimensions")
+        self.mean = X.mean(axis=0)
+        centered = X - self.mean
+        eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+        order = np.argsort(eigenvalues)[::-1]
+        rank = min(self.dim, len(X))
+        self.components = np.zeros((self.dim, X.shape[1]))
+        self.components[:rank] = eigenvectors[:, order[:rank]].T
+        total = eigenvalues.sum()
+        self.explained_variance = float(eigenvalues[order[:rank]].sum() / total) if total > 0 else 1.0
+        return self
+
+    def transform(self, vectors):
+        X = np.asarray(vectors, dtype=np.float64)
+        return ((X - self.mean) @ self.components.T).astype(np.float32).tolist()
+
+    def state(self):
+        return {"mean": self.mean, "components": self.components,
+                "explained_variance": np.float64(self.explained_variance)}
+
+    def load_state(self, state):
+        self.mean = state["mean"]
+        self.components = state["components"]
+        self.explained_variance = float(state["explained_variance"])
+
+
+class TruncationReducer:
+    kind = "truncate"
+
+    def __init__(self, dim):
+        """
+        dim: Number of leading coordinates kept.
+        """
+        self.dim = dim
+
+    @property
+    def fitted(self):
+        return True  # Nothing to learn
+
+    def describe(self):
+        return f"{self.kind}:{self.dim}"
+
+    def fit(self, vectors):
+        return self
+
+    def transform(self, vectors):
+        X = np.asarray(vectors, dtype=np.float32)[:, :self.dim]
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+        return (X / np.maximum(norms, 1e-12)).tolist()
+
+    def state(self):
+        return {}
+
+    def load_state(self, state):
+        pass
+
+
+REDUCERS = {PCAReducer.kind: PCAReducer, TruncationReducer.kind: TruncationReducer}
+
+
+def make_reducer(spec):
+    """
+    Creates an unfitted reducer from a spec string ("pca:128", "truncate:256"); None or "" gives None.
+    """
+    if not spec:
+        return None
+    kind, _, dim = spec.partition(":")
+    if kind not in REDUCERS or not dim.isdigit() or int(dim) <= 0:
+        raise ValueError(f"Invalid embedding reducer '{spec}', expected pca:<dim> or truncate:<dim>")
+    return REDUCERS[kind](int(dim))
+
+
+def reducer_path(persist_directory, collection_name):
+    return os.path.join(persist_directory, f"{collection_name}.reducer.npz")
+
+
+def save_reducer(reducer, path):
+    np.savez(path, spec=np.array(reducer.describe()), **reducer.state())
+
+
+def load_reducer(path):
+    """
+    Loads a reducer saved with save_reducer(), or returns None if there is no file.
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        reducer = make_reducer(str(data["spec"]))
+        reducer.load_state({key: data[key] for key in data.files if key != "spec"})
+    return reducer
@@ -1,8 +1,11 @@
+import threading
 import streamlit as st
 from langchain_core.documents import Document
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain.embeddings.base import Embeddings
+from langchain_core.embeddings import Embeddings
+from telemetry import get_tracer
+
+# The text splitter, chromadb and the LangChain Chroma wrapper are imported inside the methods that use them,
+# so importing this module doesn't pay for them on Streamlit reruns that never build or query a collection.
 
 # Import the custom EmbeddingClient.
 # Note: The main_app.py file will import this file, and it also imports vertex_embedding.
@@ -13,38 +16,190 @@ from langchain.embeddings.base import Embeddings
 class VertexEmbeddings(Embeddings):
     """
     Adapts the langchain Embeddings interface, allowing Chroma to directly use our Vertex EmbeddingClient.
+    With a reducer (see embedding_reducer.py), document and query embeddings are both reduced the same way.
     """
-    def __init__(self, embed_client):
+    def __init__(self, embed_client, reducer=None):
         self.embed_client = embed_client  # This is an instance of EmbeddingClient.
+        self.reducer = reducer
+        self._fit_vectors = {}  # Reduced vectors of the texts the reducer was fitted on, handed out once
+
+    def fit_reducer(self, texts):
+        """
+        Embeds `texts` (the whole corpus), fits the reducer on them and keeps the reduced vectors,
+        so adding the same texts to Chroma afterwards doesn't embed them a second time.
+        Returns False if embedding failed.
+        """
+        vectors = self.embed_client.embed_documents(texts)
+        if vectors is None:
+            return False
+        self.reducer.fit(vectors)
+        self._fit_vectors = dict(zip(texts, self.reducer.transform(vectors)))
+        return True
+
+    def _reduce(self, vectors):
+        if self.reducer is None or vectors is None:
+            return vectors
+        return self.reducer.transform(vectors)
 
     def embed_documents(self, texts):
-        return self.embed_client.embed_documents(texts)
+        if self._fit_vectors:
+            cached = [self._fit_vectors.pop(text, None) for text in texts]
+            if all(vector is not None for vector in cached):
+                return cached
+        return self._reduce(self.embed_client.embed_documents(texts))
 
     def embed_query(self, query):
-        return self.embed_client.embed_query(query)
+        vector = self.embed_client.embed_query(query)
+        if self.reducer is None or vector is None:
+            return vector
+        return self.reducer.transform([vector])[0]
+
+
+# HNSW index parameters, stored as Chroma collection metadata. The defaults are chromadb's own.
+#   space:           distance function ("l2", "cosine" or "ip")
+#   M:               graph links per node; higher = better recall, more memory, slower inserts
+#   construction_ef: candidate list size while building; higher = better graph, slower indexing
+#   search_ef:       candidate list size while querying; higher = better recall, slower queries
+HNSW_DEFAULTS = {"space": "l2", "M": 16, "construction_ef": 100, "search_ef": 10}
+
+
+def hnsw_metadata(space="l2", M=16, construction_ef=100, search_ef=10):
+    """
+    Chroma collection metadata for the given HNSW parameters.
+    """
+    return {
+        "hnsw:space": space,
+        "hnsw:M": M,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef,
+    }
+
+
+def hnsw_params(metadata):
+    """
+    Inverse of hnsw_metadata(): the HNSW parameters of a collection's metadata, with chromadb's defaults filled in.
+    """
+    metadata = metadata or {}
+    return {name: metadata.get(f"hnsw:{name}", default) for name, default in HNSW_DEFAULTS.items()}
+
+
+_chroma_clients = {}
+_chroma_clients_lock = threading.Lock()
+
+
+def get_chroma_client(persist_directory, chroma_server=None):
+    """
+    Returns the process-wide chromadb client for a persist directory, shared by every session and collection.
+    Creation is serialized: chromadb fails if two clients for the same path are created concurrently.
+    With `chroma_server` ("host:port"), returns an HTTP client for a Chroma server (`chroma run`) instead. The
+    embedded client only sees its own process's writes, so several processes must share a server.
+    """
+    import chromadb
+
+    key = chroma_server or persist_directory
+    with _chroma_clients_lock:
+        if key not in _chroma_clients:
+            if chroma_server:
+                host, _, port = chroma_server.rpartition(":")
+                _chroma_clients[key] = chromadb.HttpClient(host=host or "localhost", port=int(port))
+            else:
+                _chroma_clients[key] = chromadb.PersistentClient(path=persist_directory)
+        return _chroma_clients[key]
 
 
 class ChromaCollectionCreator:
     """
     Responsible for splitting PDF documents into small chunks, storing them in Chroma, and supporting multiple similarity searches.
     """
-    def __init__(self, processor, embed_model):
+    def __init__(self, processor, embed_model, persist_directory="./chroma_db", collection_name="langchain",
+                 space="l2", M=16, construction_ef=100, search_ef=10, embedding_reducer=None, chroma_server=None):
         """
         processor: Instance of DocumentProcessor (contains all pages of the PDF).
         embed_model: Instance of EmbeddingClient (Vertex AI).
+        persist_directory: Directory where Chroma persists the collection.
+        collection_name: Name of the Chroma collection to create.
+        space, M, construction_ef, search_ef: HNSW index parameters (see HNSW_DEFAULTS). They are fixed when the
+            collection is created; use `python chroma_maintenance.py rebuild` to change them for an existing one.
+        embedding_reducer: Optional reducer spec, "pca:<dim>" (fitted on this collection's chunks) or
+            "truncate:<dim>". It is saved with the collection and reused whenever the collection is reopened.
+        chroma_server: Optional "host:port" of a Chroma server to use instead of the embedded client. Saved
+            reducers are still kept in persist_directory.
         """
         self.processor = processor
         self.embed_model = embed_model
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.index_params = {"space": space, "M": M, "construction_ef": construction_ef, "search_ef": search_ef}
+        self.embedding_reducer = embedding_reducer
+        self.chroma_server = chroma_server
+        self.reducer = None  # The reducer in effect, set when the collection is created or loaded
         self.db = None  # Stores the Chroma vector store.
+        self.error = None  # Why the last create_chroma_collection() failed (shown with st.error in the app)
 
-    def create_chroma_collection(self):
+    def _existing_collection(self):
+        try:
+            return get_chroma_client(self.persist_directory, self.chroma_server).get_collection(self.collection_name)
+        except Exception:
+            return None
+
+    def collection_metadata(self, reducer=None):
+        metadata = hnsw_metadata(**self.index_params)
+        if reducer is not None:
+            from embedding_reducer import REDUCER_METADATA_KEY
+            metadata[REDUCER_METADATA_KEY] = reducer.describe()
+        return metadata
+
+    def resolve_reducer(self):
         """
-        1. Access processor.pages, where each page is a Document (page_content, metadata).
-        2. Split the content into chunks of a specified size and store the chunks in Chroma.
+        Returns the reducer to use: the one saved with an existing collection (warning if a different one was
+        requested), otherwise a new, unfitted one built from `embedding_reducer`. None means full-width embeddings.
         """
-        if len(self.processor.pages) == 0:
-            st.error("No documents found!")
-            return
+        from embedding_reducer import REDUCER_METADATA_KEY, load_reducer, make_reducer, reducer_path
+
+        collection = self._existing_collection()
+        if collection is None:
+            return make_reducer(self.embedding_reducer)
+
+        stored = (collection.metadata or {}).get(REDUCER_METADATA_KEY)
+        if self.embedding_reducer and stored != self.embedding_reducer:
+            st.warning(
+                f"Collection '{self.collection_name}' stores {stored or 'full-width'} embeddings, "
+                f"not {self.embedding_reducer or 'full-width'}; using {stored or 'full-width'}."
+            )
+        if not stored:
+            return None
+        reducer = load_reducer(reducer_path(self.persist_directory, self.collection_name))
+        if reducer is None:
+            raise FileNotFoundError(
+                f"Collection '{self.collection_name}' was built with embedding reducer {stored}, but "
+                f"{reducer_path(self.persist_directory, self.collection_name)} is missing"
+            )
+        return reducer
+
+    def check_index_params(self):
+        """
+        Chroma keeps the parameters of an existing collection and ignores new ones. Warns if the persisted
+        collection was built with different HNSW parameters than requested, and returns the parameters in effect.
+        """
+        collection = self._existing_collection()
+        if collection is None:
+            return self.index_params  # Doesn't exist yet: it will be created with the requested parameters
+        current = hnsw_params(collection.metadata)
+        if current != self.index_params:
+            flags = " ".join(f"--{name.replace('_', '-')} {value}" for name, value in self.index_params.items())
+            st.warning(
+                f"Collection '{self.collection_name}' uses HNSW parameters {current}, not {self.index_params}. "
+                f"Run `python chroma_maintenance.py --persist-directory {self.persist_directory} rebuild "
+                f"--collection {self.collection_name} {flags}` to change them."
+            )
+        return current
+
+    def split_pages(self):
+        """
+        Splits processor.pages into chunk Documents (deduplicated), copying each page's metadata
+        and adding a chunk_index.
+        """
+        from langchain_text_splitters import CharacterTextSplitter
 
         splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200)
         doc_list = []
@@ -69,22 +224,84 @@ class ChromaCollectionCreator:
 
                 doc_list.append(Document(page_content=chunk_text, metadata=new_meta))
 
+        return doc_list
+
+    def create_chroma_collection(self, id_prefix=None):
+        """
+        1. Access processor.pages, where each page is a Document (page_content, metadata).
+        2. Split the content into chunks of a specified size and store the chunks in Chroma.
+        id_prefix: If set, chunk i is stored under the ID f"{id_prefix}-{i}", so repeating the same ingestion
+            overwrites its chunks instead of adding duplicates.
+        """
+        self.error = None
+        if len(self.processor.pages) == 0:
+            self.error = "No documents found!"
+            st.error(self.error)
+            return
+
+        with get_tracer().span("chunk", pages=len(self.processor.pages)) as span:
+            doc_list = self.split_pages()
+            span["chunks"] = len(doc_list)
         st.success(f"Successfully split pages into {len(doc_list)} text chunks!")
 
-        # Wrap EmbeddingClient using VertexEmbeddings.
-        embedding = VertexEmbeddings(self.embed_model)
+        from langchain_community.vectorstores import Chroma
 
         try:
-            # Use from_documents() to store chunks.
-            self.db = Chroma.from_documents(
-                documents=doc_list,
-                embedding=embedding,
-                persist_directory="./chroma_db"
-            )
+            self.check_index_params()
+            reducer = self.resolve_reducer()
+
+            # Wrap EmbeddingClient using VertexEmbeddings.
+            embedding = VertexEmbeddings(self.embed_model, reducer)
+
+            # A PCA reducer for a new collection is fitted on all of its chunks first
+            if reducer is not None and not reducer.fitted:
+                with get_tracer().span("fit_reducer", chunks=len(doc_list), reducer=reducer.describe()):
+                    if not embedding.fit_reducer([doc.page_content for doc in doc_list]):
+                        self.error = "could not embed the chunks"
+                        st.error(f"Failed to create Chroma Collection: {self.error}.")
+                        return
+
+            # Use from_documents() to store chunks (the embedding calls show up as child spans).
+            # Parameters go in as a string: numeric attributes are summed into the stage totals
+            hnsw = " ".join(f"{name}={value}" for name, value in self.index_params.items())
+            with get_tracer().span("index", chunks=len(doc_list), hnsw=hnsw):
+                self.db = Chroma.from_documents(
+                    documents=doc_list,
+                    ids=[f"{id_prefix}-{i}" for i in range(len(doc_list))] if id_prefix else None,
+                    embedding=embedding,
+                    client=get_chroma_client(self.persist_directory, self.chroma_server),
+                    collection_name=self.collection_name,
+                    collection_metadata=self.collection_metadata(reducer)
+                )
+            if reducer is not None:
+                from embedding_reducer import reducer_path, save_reducer
+                save_reducer(reducer, reducer_path(self.persist_directory, self.collection_name))
+            self.reducer = reducer
             st.success("Successfully created Chroma Collection!")
         except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
             st.error(f"Failed to create Chroma Collection: {e}")
 
+    def load_chroma_collection(self):
+        """
+        Opens the already persisted collection `collection_name` in `persist_directory` without re-embedding anything.
+        """
+        from langchain_community.vectorstores import Chroma
+
+        self.check_index_params()
+        reducer = self.resolve_reducer()
+        if reducer is not None and not reducer.fitted:
+            # A collection that doesn't exist yet has no chunks to fit PCA on; it stays full-width
+            reducer = None
+        self.db = Chroma(
+            client=get_chroma_client(self.persist_directory, self.chroma_server),
+            collection_name=self.collection_name,
+            embedding_function=VertexEmbeddings(self.embed_model, reducer),
+            collection_metadata=self.collection_metadata(reducer)
+        )
+        self.reducer = reducer
+        return self.db
+
     def query_chroma_collection(self, query, k=1):
         """
         Returns the top-k matching results: [(Document, score), ...].
@@ -93,7 +310,9 @@ class ChromaCollectionCreator:
             st.error("Chroma Collection has not been created!")
             return None
 
-        docs = self.db.similarity_search_with_relevance_scores(query, k=k)
+        with get_tracer().span("retrieve") as span:
+            docs = self.db.similarity_search_with_relevance_scores(query, k=k)
+            span["results"] = len(docs)
         if docs:
             return docs
         else:
@@ -2,18 +2,35 @@ import streamlit as st
 import os
 import sys
 import json
+import threading
+import contextvars
+import functools
 
 sys.path.append(os.path.abspath('../../'))
-from File_uploader import DocumentProcessor
-from vertex_embedding import EmbeddingClient
-from integration import ChromaCollectionCreator
+from context_formatter import ContextFormatter
+from vertex_scheduler import get_scheduler, INTERACTIVE
+from telemetry import get_tracer
 
-from langchain_core.prompts import PromptTemplate
-from langchain_google_vertexai import VertexAI
+# langchain_core / langchain_google_vertexai are imported where they are used, so importing this
+# module stays cheap until a quiz is actually generated.
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm(model_name, temperature, max_output_tokens):
+    """
+    Returns a process-wide VertexAI client, shared by every QuizGenerator (and Streamlit session) using the same settings.
+    """
+    from langchain_google_vertexai import VertexAI
+
+    return VertexAI(
+        model_name=model_name,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens
+    )
 
 
 class QuizGenerator:
-    def __init__(self, topic=None, num_questions=1, vectorstore=None):
+    def __init__(self, topic=None, num_questions=1, vectorstore=None, context_token_budget=1500):
         """
         Initializes the QuizGenerator with a required topic, the number of questions for the quiz,
         and an optional vectorstore for querying related information.
@@ -21,6 +38,7 @@ class QuizGenerator:
         :param topic: A string representing the required topic of the quiz.
         :param num_questions: An integer representing the number of questions to generate for the quiz, up to a maximum of 10.
         :param vectorstore: An optional vectorstore instance (e.g., ChromaDB) to be used for querying information related to the quiz topic.
+        :param context_token_budget: Maximum number of (estimated) tokens of retrieved context packed into each prompt.
         """
         if not topic:
             self.topic = "General Knowledge"
@@ -33,6 +51,8 @@ class QuizGenerator:
 
         self.vectorstore = vectorstore
         self.llm = None
+        self.llm_model_name = "gemini-pro"  # Or chat-gemini@001, text-bison@002, etc.
+        self.context_formatter = ContextFormatter(token_budget=context_token_budget)
         self.question_bank = []  # Initialize the question bank to store questions
 
         self.system_template = """
@@ -64,12 +84,41 @@ class QuizGenerator:
         """
         Initializes and configures the Large Language Model (LLM) for generating quiz questions.
         """
-        self.llm = VertexAI(
-            model_name="gemini-pro",  # Or chat-gemini@001, text-bison@002, etc.
-            temperature=0.8,  # A bit higher for variability
-            max_output_tokens=500
+        self.llm = get_llm(
+            self.llm_model_name,
+            0.8,  # A bit higher for variability
+            500   # max_output_tokens
         )
 
+    def invoke_llm(self, prompt_value):
+        """
+        Sends a formatted prompt to the LLM through the process-wide request scheduler, so generation
+        calls share the model's rate limit and run ahead of background ingestion.
+        Generation is sampled, so identical prompts are deliberately not coalesced.
+        """
+        prompt_text = prompt_value.to_string() if hasattr(prompt_value, "to_string") else str(prompt_value)
+        with get_tracer().span("llm", prompt_tokens=self.context_formatter.estimate_tokens(prompt_text)) as span:
+            response = get_scheduler().call(
+                self.llm_model_name,
+                lambda: self.llm.invoke(prompt_value),
+                priority=INTERACTIVE
+            )
+            span["output_tokens"] = self.context_formatter.estimate_tokens(str(response))
+        return response
+
+    def build_context(self, retriever, topic):
+        """
+        Retrieves the Documents for the topic and packs them into the prompt context, tracing both steps.
+        """
+        with get_tracer().span("retrieve") as span:
+            docs = retriever.invoke(topic)
+            span["results"] = len(docs)
+        with get_tracer().span("pack_context") as span:
+            context = self.context_formatter.format_documents(docs)
+            span["packed_tokens"] = self.context_formatter.last_report["packed_tokens"]
+            span["saved_tokens"] = self.context_formatter.last_report["saved_tokens"]
+        return context
+
     def generate_question_with_vectorstore(self):
         """
         Generates a quiz question based on the topic provided using a vectorstore.
@@ -82,7 +131,8 @@ class QuizGenerator:
         if not self.vectorstore:
             raise ValueError("Vectorstore not provided.")
 
-        from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+        from langchain_core.prompts import PromptTemplate
+        from langchain_core.runnables import RunnablePassthrough, RunnableParallel, RunnableLambda
 
         # 1) Enable a Retriever
         # If your vectorstore is a ChromaCollectionCreator, it may expose .db, so check carefully.
@@ -92,13 +142,17 @@ class QuizGenerator:
         # 2) Use the system template to create a PromptTemplate
         prompt = PromptTemplate.from_template(self.system_template)
 
-        # 3) RunnableParallel: get {context, topic} from retriever + passthrough
+        # 3) RunnableParallel: get {context, topic} from retriever + passthrough.
+        #    The retrieved Documents are packed into plain text so no repr/metadata reaches the prompt.
         setup_and_retrieval = RunnableParallel(
-            {"context": retriever, "topic": RunnablePassthrough()}
+            {
+                "context": RunnableLambda(lambda topic: self.build_context(retriever, topic)),
+                "topic": RunnablePassthrough()
+            }
         )
 
-        # 4) Create a chain: retrieve -> prompt -> LLM
-        chain = setup_and_retrieval | prompt | self.llm
+        # 4) Create a chain: retrieve -> prompt -> LLM (via the scheduler)
+        chain = setup_and_retrieval | prompt | RunnableLambda(self.invoke_llm)
 
         # 5) Invoke the chain with the topic as input
         response = chain.invoke(self.topic)
@@ -110,6 +164,16 @@ class QuizGenerator:
         """
         self.question_bank = []  # Reset the question bank
 
+        for _ in self.iter_questions():
+            pass
+
+        return self.question_bank
+
+    def iter_questions(self):
+        """
+        Generates up to num_questions unique quiz questions, appending each validated question
+        to self.question_bank and yielding it as soon as it is available.
+        """
         for _ in range(self.num_questions):
             # 1. Use class method to generate question (JSON string).
             question_str = self.generate_question_with_vectorstore()
@@ -125,10 +189,33 @@ class QuizGenerator:
                 print("Successfully generated unique question")
                 # 4. Add to question_bank if unique
                 self.question_bank.append(question_dict)
+                yield question_dict
             else:
                 print("Duplicate or invalid question detected.")
 
-        return self.question_bank
+    def generate_quiz_in_background(self, on_question, on_done) -> threading.Thread:
+        """
+        Starts a daemon thread that generates the quiz and hands over each validated question as soon as it exists.
+
+        :param on_question: Called with each validated question dict (e.g. to append it to a QuizStore).
+        :param on_done: Called once generation ends, with None on success or the error message on failure.
+        :return: The started thread.
+        """
+        def worker():
+            error = None
+            try:
+                for question in self.iter_questions():
+                    on_question(question)
+            except Exception as e:
+                error = str(e)
+            finally:
+                on_done(error)
+
+        self.question_bank = []
+        # Run in a copy of the caller's context, so the worker's spans join the caller's trace run
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True)
+        thread.start()
+        return thread
 
     def validate_question(self, question: dict) -> bool:
         """
@@ -154,6 +241,10 @@ class QuizGenerator:
 
 # Test Generating the Quiz
 if __name__ == "__main__":
+    from File_uploader import DocumentProcessor
+    from vertex_embedding import EmbeddingClient
+    from integration import ChromaCollectionCreator
+
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/Users/liuhaibo/gcloud_key/geminisample-425519-a9f2d1d62e3b.json"
     embed_config = {
         "model_name": "textembedding-gecko@003",
@@ -0,0 +1,462 @@
+# quiz_service.py
+"""
+Async HTTP service for Quizzify.
+
+    uvicorn quiz_service:app                                                      # embedded Chroma, one process
+    chroma run --path ./chroma_db --port 8001 &
+    QUIZZIFY_CHROMA_SERVER=localhost:8001 uvicorn quiz_service:app --workers 4   # several processes
+
+Endpoints:
+  POST /collections/{collection}/documents?filename=notes.pdf   body: raw PDF bytes -> 202 {job_id}
+  POST /collections/{collection}/search                         {"query": ..., "k": 3} -> matching chunks
+  POST /quizzes                                                 {"collection", "topic", "num_questions"} -> 202 {job_id, quiz_id}
+  GET  /jobs/{job_id}                                           -> status / result / error
+  GET  /quizzes/{quiz_id}                                       -> a stored quiz with its questions
+  GET  /metrics                                                 -> Prometheus text (stages, scheduler, jobs)
+
+Ingestion and quiz generation are long-running, so they are queued as jobs in a SQLite table in the
+service's data directory (QUIZZIFY_DATA_DIR, next to the uploads waiting to be ingested). Every worker process claims jobs from that shared table, so any worker can run a job and any
+worker can answer a status poll. A running job holds a lease that its worker renews; if the worker process dies,
+the lease expires and another worker picks the job up again (at most MAX_ATTEMPTS times).
+
+The embedded Chroma client doesn't see writes made by other processes (and concurrent writers can corrupt the
+HNSW files), so without QUIZZIFY_CHROMA_SERVER the service refuses to start a second process on the same
+persist directory. To run several worker processes, start a Chroma server and point every process at it.
+
+Configuration (environment variables): QUIZZIFY_PERSIST_DIR, QUIZZIFY_DATA_DIR (job queue and queued uploads),
+QUIZZIFY_CHROMA_SERVER (host:port of a Chroma server),
+QUIZZIFY_EMBEDDING_MODEL, QUIZZIFY_LOCATION, QUIZZIFY_JOB_WORKERS (concurrent jobs per process), QUIZZIFY_MAX_UPLOAD_BYTES (larger uploads get 413),
+QUIZZIFY_QUIZ_STORE (generated quizzes, shared with the Streamlit app),
+QUIZZIFY_EMBEDDING_REDUCER (e.g. pca:128, stores new collections' embeddings at reduced width).
+"""
+import asyncio
+import fcntl
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from telemetry import get_tracer
+from vertex_scheduler import get_scheduler
+from quiz_store import get_quiz_store
+
+PERSIST_DIR = os.environ.get("QUIZZIFY_PERSIST_DIR", "./chroma_db")
+DATA_DIR = os.environ.get("QUIZZIFY_DATA_DIR", "./quiz_service_data")  # Kept out of the Chroma persist directory
+CHROMA_SERVER = os.environ.get("QUIZZIFY_CHROMA_SERVER")  # e.g. "localhost:8001"; required for several processes
+EMBEDDING_MODEL = os.environ.get("QUIZZIFY_EMBEDDING_MODEL", "textembedding-gecko@003")
+LOCATION = os.environ.get("QUIZZIFY_LOCATION", "us-central1")
+JOB_WORKERS = int(os.environ.get("QUIZZIFY_JOB_WORKERS", "4"))
+MAX_UPLOAD_BYTES = int(os.environ.get("QUIZZIFY_MAX_UPLOAD_BYTES", 200 * 1024 * 1024))  # Same cap as DocumentProcessor
+EMBEDDING_REDUCER = os.environ.get("QUIZZIFY_EMBEDDING_REDUCER")  # e.g. "pca:128", applied to new collections
+POLL_SECONDS = 0.5
+LEASE_SECONDS = 60  # A running job whose lease isn't renewed for this long is given to another worker
+HEARTBEAT_SECONDS = 10
+MAX_ATTEMPTS = 3
+
+COLLECTION_NAME = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9_-]{1,61}[a-zA-Z0-9]$")
+
+
+class JobStore:
+    """
+    Job queue shared by all worker processes, backed by SQLite (WAL mode).
+    A job moves queued -> running -> done | failed; claim() is atomic across processes.
+    `updated` is the lease of a running job: heartbeat() renews it, and claim() takes over running jobs
+    whose lease has expired (their worker died), failing them once they have been attempted MAX_ATTEMPTS times.
+    """
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT, params TEXT, status TEXT, result TEXT, error TEXT,"
+                " worker TEXT, created REAL, updated REAL, attempts INTEGER DEFAULT 0)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def create(self, kind, params, job_id=None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params), now, now)
+            )
+        return job_id
+
+    def claim(self, worker):
+        """
+        Marks the oldest queued (or abandoned running) job as running for `worker` and returns it,
+        or None if the queue is empty.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated = ? "
+                "WHERE status = 'running' AND updated < ? AND attempts >= ?",
+                (f"Worker lost {MAX_ATTEMPTS} times", now, now - LEASE_SECONDS, MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                "SELECT id, kind, params FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated < ?) "
+                "ORDER BY created LIMIT 1",
+                (now - LEASE_SECONDS,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, updated = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker, now, row[0])
+            )
+            conn.execute("COMMIT")
+            return {"id": row[0], "kind": row[1], "params": json.loads(row[2]), "worker": worker}
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id, worker) -> bool:
+        """
+        Renews the lease of a running job. Returns False if `worker` no longer holds it.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job_id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, job_id, worker):
+        """
+        Puts a running job back in the queue (its worker is shutting down).
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, attempts = attempts - 1, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job_id, worker)
+            )
+
+    def finish(self, job_id, result=None, error=None, worker=None) -> bool:
+        """
+        Records the outcome of a job. With `worker`, only if that worker still holds the job;
+        returns False if it doesn't.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated = ? "
+                "WHERE id = ? AND (? IS NULL OR (worker = ? AND status = 'running'))",
+                ("failed" if error else "done", json.dumps(result), error, time.time(), job_id, worker, worker)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, result, error, created, updated FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0], "kind": row[1], "status": row[2],
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4], "created": row[5], "updated": row[6],
+        }
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+# ----------------- Pipeline (blocking; run in threads) -----------------
+_collections = {}
+_collections_lock = threading.Lock()
+_embed_client = None
+
+
+def get_embed_client():
+    global _embed_client
+    with _collections_lock:
+        if _embed_client is None:
+            from vertex_embedding import EmbeddingClient
+            _embed_client = EmbeddingClient(model_name=EMBEDDING_MODEL, location=LOCATION)
+        return _embed_client
+
+
+def open_collection(name):
+    """
+    Returns a ChromaCollectionCreator bound to the persisted collection `name` (cached per process; every
+    process either is the only one using the persist directory or talks to the same Chroma server).
+    Raises KeyError if the collection hasn't been created yet.
+    """
+    from integration import ChromaCollectionCreator, get_chroma_client
+
+    embed_client = get_embed_client()
+    with _collections_lock:
+        if name not in _collections:
+            try:
+                get_chroma_client(PERSIST_DIR, CHROMA_SERVER).get_collection(name)
+            except Exception:
+                raise KeyError(name)
+            creator = ChromaCollectionCreator(None, embed_client, PERSIST_DIR, name, chroma_server=CHROMA_SERVER)
+            creator.load_chroma_collection()
+            _collections[name] = creator
+        return _collections[name]
+
+
+def run_ingest(params):
+    from File_uploader import DocumentProcessor, LocalPDF
+    from integration import ChromaCollectionCreator
+
+    # The uploaded file is removed by job_worker once the job is finished, so a retried job still finds it
+    processor = DocumentProcessor()
+    processor.ingest_uploaded_file(LocalPDF(params["path"], name=params["filename"]))
+    creator = ChromaCollectionCreator(processor, get_embed_client(), PERSIST_DIR, params["collection"],
+                                      embedding_reducer=EMBEDDING_REDUCER, chroma_server=CHROMA_SERVER)
+    # Chunk IDs derived from the job ID: a retried job overwrites its chunks instead of duplicating them
+    creator.create_chroma_collection(id_prefix=params["job_id"])
+    if creator.db is None:
+        raise RuntimeError("could not build the Chroma collection")
+    return {"collection": params["collection"], "pages": len(processor.pages)}
+
+
+def run_quiz(params):
+    from quiz_algo import QuizGenerator
+
+    # The quiz was created when the job was submitted; a retried job starts it over under the same ID
+    store = get_quiz_store()
+    quiz_id = params["quiz_id"]
+    store.restart_quiz(quiz_id)
+    try:
+        try:
+            creator = open_collection(params["collection"])
+        except KeyError:
+            raise ValueError(f"Unknown collection: {params['collection']}")
+        generator = QuizGenerator(params["topic"], params["num_questions"], creator)
+        for question in generator.iter_questions():
+            store.append_question(quiz_id, question)
+    except Exception as e:
+        store.finish_quiz(quiz_id, str(e))
+        raise
+    store.finish_quiz(quiz_id)
+    return {"quiz_id": quiz_id, "questions": generator.question_bank}
+
+
+JOB_HANDLERS = {"ingest": run_ingest, "quiz": run_quiz}
+
+
+# ----------------- Job workers -----------------
+async def run_job(store, job):
+    """
+    Runs a claimed job in a thread, renewing its lease until it finishes. If the worker is cancelled
+    (shutdown), the job goes back to the queue.
+    """
+    task = asyncio.ensure_future(asyncio.to_thread(JOB_HANDLERS[job["kind"]], job["params"]))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=HEARTBEAT_SECONDS)
+            if done:
+                return task.result()
+            await asyncio.to_thread(store.heartbeat, job["id"], job["worker"])
+    except asyncio.CancelledError:
+        await asyncio.to_thread(store.release, job["id"], job["worker"])
+        raise
+
+
+async def job_worker(store, wake, worker_id):
+    while True:
+        job = await asyncio.to_thread(store.claim, worker_id)
+        if job is None:
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+            continue
+        try:
+            result = await run_job(store, job)
+        except Exception as e:
+            finished = await asyncio.to_thread(store.finish, job["id"], None, f"{type(e).__name__}: {e}", worker_id)
+        else:
+            finished = await asyncio.to_thread(store.finish, job["id"], result, None, worker_id)
+        if finished and job["kind"] == "ingest" and os.path.exists(job["params"]["path"]):
+            await asyncio.to_thread(os.unlink, job["params"]["path"])
+
+
+def lock_persist_directory():
+    """
+    Without a Chroma server, only one process may use the persist directory: the embedded client doesn't see
+    other processes' writes. Holds an exclusive lock for the lifetime of the process, or raises RuntimeError.
+    """
+    lock_file = open(os.path.join(PERSIST_DIR, "quiz_service.lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise RuntimeError(
+            f"Another quiz_service process is using {PERSIST_DIR} with embedded Chroma. "
+            "Run a single process, or start a Chroma server and set QUIZZIFY_CHROMA_SERVER=host:port."
+        )
+    return lock_file
+
+
+@asynccontextmanager
+async def lifespan(app):
+    os.makedirs(os.path.join(DATA_DIR, "uploads"), exist_ok=True)
+    os.makedirs(PERSIST_DIR, exist_ok=True)
+    lock_file = None if CHROMA_SERVER else lock_persist_directory()
+    app.state.jobs = JobStore(os.path.join(DATA_DIR, "jobs.sqlite3"))
+    app.state.wake = asyncio.Event()
+    process_id = f"{os.uname().nodename}-{os.getpid()}"
+    workers = [
+        asyncio.create_task(job_worker(app.state.jobs, app.state.wake, f"{process_id}-{i}"))
+        for i in range(JOB_WORKERS)
+    ]
+    yield
+    for worker in workers:
+        worker.cancel()
+    # Wait for the workers to put their running jobs back in the queue
+    await asyncio.gather(*workers, return_exceptions=True)
+    if lock_file is not None:
+        lock_file.close()
+
+
+app = FastAPI(title="Quizzify", lifespan=lifespan)
+
+
+# ----------------- API -----------------
+class SearchRequest(BaseModel):
+    query: str
+    k: int = Field(3, ge=1, le=50)
+
+
+class QuizRequest(BaseModel):
+    collection: str
+    topic: str
+    num_questions: int = Field(1, ge=1, le=10)
+
+
+def check_collection_name(name):
+    if not COLLECTION_NAME.match(name):
+        raise HTTPException(400, "Collection names are 3-63 characters of letters, digits, '_' or '-'.")
+
+
+@app.post("/collections/{collection}/documents", status_code=202)
+async def ingest_document(collection: str, request: Request, filename: str = "upload.pdf"):
+    check_collection_name(collection)
+    job_id = uuid.uuid4().hex
+    path = os.path.join(DATA_DIR, "uploads", f"{job_id}.pdf")
+    await save_upload(request, path)
+    await asyncio.to_thread(
+        request.app.state.jobs.create,
+        "ingest", {"collection": collection, "path": path, "filename": filename, "job_id": job_id}, job_id
+    )
+    request.app.state.wake.set()
+    return {"job_id": job_id, "status": "queued"}
+
+
+async def save_upload(request, path):
+    """
+    Streams the request body into `path` chunk by chunk, so an upload is never held in memory.
+    Raises 400 if it doesn't start like a PDF and 413 once it exceeds MAX_UPLOAD_BYTES (removing the partial file).
+    """
+    size = 0
+    header = b""
+    f = await asyncio.to_thread(open, path, "wb")
+    try:
+        async for chunk in request.stream():
+            if len(header) < 4:
+                header += chunk[:4 - len(header)]
+                if len(header) == 4 and header != b"%PDF":
+                    raise HTTPException(400, "Request body must be a PDF file.")
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(413, f"Uploads are limited to {MAX_UPLOAD_BYTES / 1e6:.1f} MB.")
+            await asyncio.to_thread(f.write, chunk)
+        if header != b"%PDF":
+            raise HTTPException(400, "Request body must be a PDF file.")
+    except BaseException:
+        f.close()
+        os.unlink(path)
+        raise
+    f.close()
+
+
+@app.post("/collections/{collection}/search")
+async def search(collection: str, body: SearchRequest):
+    check_collection_name(collection)
+    try:
+        creator = await asyncio.to_thread(open_collection, collection)
+    except KeyError:
+        raise HTTPException(404, f"Unknown collection: {collection}")
+    results = await asyncio.to_thread(creator.query_chroma_collection, body.query, body.k) or []
+    return {
+        "results": [
+            {"content": doc.page_content, "metadata": doc.metadata, "score": score}
+            for doc, score in results
+        ]
+    }
+
+
+@app.post("/quizzes", status_code=202)
+async def create_quiz(body: QuizRequest, request: Request):
+    check_collection_name(body.collection)
+    # The quiz ID is allocated up front, so it can be shared right away and a retried job reuses it
+    quiz_id = await asyncio.to_thread(get_quiz_store().create_quiz, body.topic, body.num_questions, (), "queued")
+    job_id = await asyncio.to_thread(request.app.state.jobs.create, "quiz", dict(body.model_dump(), quiz_id=quiz_id))
+    request.app.state.wake.set()
+    return {"job_id": job_id, "quiz_id": quiz_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    job = await asyncio.to_thread(request.app.state.jobs.get, job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return job
+
+
+@app.get("/quizzes/{quiz_id}")
+async def get_quiz(quiz_id: str):
+    store = get_quiz_store()
+    quiz = await asyncio.to_thread(store.get_quiz, quiz_id)
+    if quiz is None:
+        raise HTTPException(404, f"Unknown quiz: {quiz_id}")
+    quiz["questions"] = await asyncio.to_thread(store.get_questions, quiz_id)
+    return quiz
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    lines = [get_tracer().export_prometheus().rstrip("\n")]
+
+    scheduler = get_scheduler().metrics()
+    lines.append("# TYPE quizzify_scheduler_queue_depth gauge")
+    lines.append(f"quizzify_scheduler_queue_depth {scheduler['queue_depth']}")
+    for key in ("submitted", "completed", "failed", "coalesced", "retried"):
+        lines.append(f"# TYPE quizzify_scheduler_{key}_total counter")
+        lines.append(f"quizzify_scheduler_{key}_total {scheduler[key]}")
+
+    lines.append("# TYPE quizzify_jobs gauge")
+    for status, count in (await asyncio.to_thread(request.app.state.jobs.counts)).items():
+        lines.append(f'quizzify_jobs{{status="{status}"}} {count}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,199 @@
+# quiz_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+
+def pack_question(question: dict) -> bytes:
+    """
+    Compact serialized form of a question: minified JSON, zlib-compressed.
+    """
+    return zlib.compress(json.dumps(question, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_question(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class QuizStore:
+    """
+    Server-side store for generated quizzes, backed by SQLite:
+      - quizzes:   one row per quiz (topic, target size, generation status)
+      - questions: one compact row per (quiz_id, index), read lazily by QuizManager
+      - attempts:  every submitted answer, used for scores
+    Sessions only keep the quiz ID, so quizzes survive the session and can be shared or resumed.
+    """
+    def __init__(self, path, stale_after=300):
+        """
+        path: SQLite file.
+        stale_after: Seconds without a new question after which a "generating" quiz is marked as failed
+                     (its generator died, e.g. the process was restarted).
+        """
+        self.path = path
+        self.stale_after = stale_after
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS quizzes (
+                quiz_id TEXT PRIMARY KEY, topic TEXT, num_questions INTEGER,
+                status TEXT, error TEXT, created REAL, updated REAL
+            );
+            CREATE TABLE IF NOT EXISTS questions (
+                quiz_id TEXT, idx INTEGER, payload BLOB, PRIMARY KEY (quiz_id, idx)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS attempts (
+                quiz_id TEXT, idx INTEGER, session_id TEXT, answer TEXT, correct INTEGER, ts REAL
+            );
+            CREATE INDEX IF NOT EXISTS attempts_session ON attempts (quiz_id, session_id);
+            """
+        )
+
+    def _conn(self):
+        # One connection per thread (background generation writes from its own thread).
+        if not hasattr(self._local, "conn"):
+            self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return self._local.conn
+
+    # ----------------- Quizzes -----------------
+    def create_quiz(self, topic, num_questions, questions=(), status="generating") -> str:
+        """
+        Creates a quiz in the "generating" state (or "queued", when generation starts later) and returns its ID.
+        Pass `questions` to store them right away.
+        """
+        quiz_id = uuid.uuid4().hex[:16]
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO quizzes VALUES (?, ?, ?, ?, NULL, ?, ?)",
+            (quiz_id, topic, num_questions, status, now, now)
+        )
+        for question in questions:
+            self.append_question(quiz_id, question)
+        return quiz_id
+
+    def restart_quiz(self, quiz_id):
+        """
+        Puts a quiz (back) into the "generating" state without questions, e.g. when a retried job regenerates it.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM questions WHERE quiz_id = ?", (quiz_id,))
+            conn.execute(
+                "UPDATE quizzes SET status = 'generating', error = NULL, updated = ? WHERE quiz_id = ?",
+                (time.time(), quiz_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def finish_quiz(self, quiz_id, error=None):
+        """
+        Marks generation as finished ("done"), or "failed" with an error message.
+        """
+        self._conn().execute(
+            "UPDATE quizzes SET status = ?, error = ?, updated = ? WHERE quiz_id = ?",
+            ("failed" if error else "done", error, time.time(), quiz_id)
+        )
+
+    def get_quiz(self, quiz_id):
+        """
+        Returns the quiz's metadata (without questions), or None if it doesn't exist.
+        A "generating" quiz that hasn't made progress for `stale_after` seconds is marked as failed first.
+        """
+        conn = self._conn()
+        select = "SELECT quiz_id, topic, num_questions, status, error, created, updated FROM quizzes WHERE quiz_id = ?"
+        row = conn.execute(select, (quiz_id,)).fetchone()
+        if row is not None and row[3] == "generating" and row[6] < time.time() - self.stale_after:
+            # Only write when the quiz looks stale. Matching on `updated` leaves a quiz alone that made
+            # progress (or finished) after the SELECT.
+            conn.execute(
+                "UPDATE quizzes SET status = 'failed', error = ?, updated = ? "
+                "WHERE quiz_id = ? AND status = 'generating' AND updated = ?",
+                (f"Generation stopped: no new question for {self.stale_after} seconds", time.time(), quiz_id, row[6])
+            )
+            row = conn.execute(select, (quiz_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "quiz_id": row[0], "topic": row[1], "num_questions": row[2], "status": row[3],
+            "error": row[4], "created": row[5], "questions_available": self.count_questions(quiz_id),
+        }
+
+    # ----------------- Questions -----------------
+    def append_question(self, quiz_id, question: dict) -> int:
+        """
+        Adds a question at the next index and returns that index.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            index = conn.execute("SELECT COUNT(*) FROM questions WHERE quiz_id = ?", (quiz_id,)).fetchone()[0]
+            conn.execute("INSERT INTO questions VALUES (?, ?, ?)", (quiz_id, index, pack_question(question)))
+            conn.execute("UPDATE quizzes SET updated = ? WHERE quiz_id = ?", (time.time(), quiz_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return index
+
+    def count_questions(self, quiz_id) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM questions WHERE quiz_id = ?", (quiz_id,)).fetchone()[0]
+
+    def get_question(self, quiz_id, index) -> dict:
+        row = self._conn().execute(
+            "SELECT payload FROM questions WHERE quiz_id = ? AND idx = ?", (quiz_id, index)
+        ).fetchone()
+        if row is None:
+            raise IndexError(f"Quiz {quiz_id} has no question {index}")
+        return unpack_question(row[0])
+
+    def get_questions(self, quiz_id) -> list:
+        rows = self._conn().execute(
+            "SELECT payload FROM questions WHERE quiz_id = ? ORDER BY idx", (quiz_id,)
+        ).fetchall()
+        return [unpack_question(row[0]) for row in rows]
+
+    # ----------------- Attempts -----------------
+    def record_attempt(self, quiz_id, index, session_id, answer, correct):
+        self._conn().execute(
+            "INSERT INTO attempts VALUES (?, ?, ?, ?, ?, ?)",
+            (quiz_id, index, session_id, answer, int(correct), time.time())
+        )
+
+    def score(self, quiz_id, session_id) -> dict:
+        """
+        Score of a session, counting only its latest attempt at each question.
+        """
+        rows = self._conn().execute(
+            "SELECT idx, correct FROM attempts WHERE quiz_id = ? AND session_id = ? ORDER BY ts",
+            (quiz_id, session_id)
+        ).fetchall()
+        latest = dict(rows)
+        return {
+            "answered": len(latest),
+            "correct": sum(latest.values()),
+            "total": self.count_questions(quiz_id),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_quiz_store() -> QuizStore:
+    """
+    Returns the process-wide QuizStore (path from QUIZZIFY_QUIZ_STORE, default ./quiz_store.sqlite3).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = QuizStore(os.environ.get("QUIZZIFY_QUIZ_STORE", "./quiz_store.sqlite3"))
+        return _store
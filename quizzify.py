@@ -2,13 +2,27 @@ import streamlit as st
 import os
 import sys
 import json
+import time
+import uuid
 
 sys.path.append(os.path.abspath('../../'))
-from File_uploader import DocumentProcessor
-from vertex_embedding import EmbeddingClient
-from integration import ChromaCollectionCreator
-from quiz_algo import QuizGenerator  # from tasks.task_8.task_8 -> now quiz_generator
 from ui import QuizManager  # from tasks.task_9.task_9 -> now quiz_manager
+from telemetry import get_tracer, render_debug_panel
+from quiz_store import get_quiz_store
+
+# Streamlit re-executes this script on every interaction. The PDF / embedding / Chroma / LLM modules are
+# imported inside the Quiz Builder branch only, and the expensive clients are process-wide cached resources.
+
+
+@st.cache_resource
+def get_embedding_client(model_name, location):
+    """
+    One EmbeddingClient (and VertexAIEmbeddings) per process, shared by all reruns and sessions.
+    """
+    from vertex_embedding import EmbeddingClient
+
+    return EmbeddingClient(model_name=model_name, location=location)
+
 
 if __name__ == "__main__":
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/Users/liuhaibo/gcloud_key/geminisample-425519-a9f2d1d62e3b.json"
@@ -17,18 +31,40 @@ if __name__ == "__main__":
         "location": "us-central1"
     }
 
+    # Quizzes live in the server-side store; st.session_state only keeps the quiz ID and the current index.
+    store = get_quiz_store()
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+
+    # A shared or bookmarked link (?quiz=<id>) opens an existing quiz
+    shared_quiz_id = st.query_params.get("quiz")
+    if shared_quiz_id and shared_quiz_id != st.session_state.get('quiz_id') and store.get_quiz(shared_quiz_id):
+        st.session_state['quiz_id'] = shared_quiz_id
+        st.session_state['display_quiz'] = True
+        st.session_state['question_index'] = 0
+
+    quiz = store.get_quiz(st.session_state['quiz_id']) if st.session_state.get('quiz_id') else None
+    # Background generation is still running (or queued in the quiz service) until the store marks the quiz as finished.
+    generating = quiz is not None and quiz['status'] in ('queued', 'generating')
+
     # ----------------- Add Session State -----------------
-    # If we haven't stored a question_bank or it's empty, we do the "Quiz Builder" form.
-    if 'question_bank' not in st.session_state or len(st.session_state['question_bank']) == 0:
+    # If we have no quiz or it's empty (and nothing is being generated), we do the "Quiz Builder" form.
+    if quiz is None or (quiz['questions_available'] == 0 and not generating):
 
-        # Step 1: init the question bank list in st.session_state
-        if 'question_bank' not in st.session_state:
-            st.session_state['question_bank'] = []
+        # Step 1: init the quiz flags in st.session_state
         if 'display_quiz' not in st.session_state:
             st.session_state['display_quiz'] = False
         if 'question_index' not in st.session_state:
             st.session_state['question_index'] = 0
 
+        from File_uploader import DocumentProcessor
+        from integration import ChromaCollectionCreator
+        from quiz_algo import QuizGenerator  # from tasks.task_8.task_8 -> now quiz_generator
+
+        # An opened quiz that ended without any question (e.g. its generation died with a restart)
+        if quiz is not None and quiz['error']:
+            st.warning(f"Quiz {quiz['quiz_id']} has no questions: {quiz['error']}")
+
         screen = st.empty()
         with screen.container():
             st.header("Quiz Builder")
@@ -40,17 +76,21 @@ if __name__ == "__main__":
                 processor = DocumentProcessor()
                 processor.ingest_documents()
 
-                embed_client = EmbeddingClient(**embed_config)
+                embed_client = get_embedding_client(**embed_config)
 
                 chroma_creator = ChromaCollectionCreator(processor, embed_client)
 
                 # Step 2: Set topic input and number of questions
                 topic_input = st.text_input("Topic for Generative Quiz", placeholder="Enter the topic of the document")
                 questions = st.slider("Number of Questions", min_value=1, max_value=10, value=1)
+                progressive = st.checkbox("Show questions as soon as they are generated", value=True)
 
                 submitted = st.form_submit_button("Submit")
 
                 if submitted:
+                    # Group every traced stage of this submission into one run for this session's debug panel
+                    # (the background generation thread inherits the run)
+                    st.session_state['trace_run_id'] = get_tracer().start_run(f"quiz: {topic_input}")
                     chroma_creator.create_chroma_collection()
 
                     if len(processor.pages) > 0:
@@ -59,23 +99,56 @@ if __name__ == "__main__":
                     # Step 3: Initialize a QuizGenerator class using the topic, number of questions, and the chroma collection
                     generator = QuizGenerator(topic_input, questions, chroma_creator)
 
-                    question_bank = generator.generate_quiz()
+                    quiz_id = store.create_quiz(topic_input, questions)
+                    if progressive:
+                        # Generate in a background worker and switch to the quiz as soon as the first question exists
+                        worker = generator.generate_quiz_in_background(
+                            on_question=lambda q: store.append_question(quiz_id, q),
+                            on_done=lambda error: store.finish_quiz(quiz_id, error)
+                        )
+                        while store.count_questions(quiz_id) == 0 and worker.is_alive():
+                            time.sleep(0.2)
+                    else:
+                        for question in generator.generate_quiz():
+                            store.append_question(quiz_id, question)
+                        store.finish_quiz(quiz_id)
 
-                    # Step 4: Initialize the question bank list in st.session_state
-                    st.session_state['question_bank'] = question_bank
+                    # Step 4: Keep only the quiz handle in st.session_state
+                    st.session_state['quiz_id'] = quiz_id
                     # Step 5: Set a display_quiz flag in st.session_state to True
                     st.session_state['display_quiz'] = True
                     # Step 6: Set the question_index to 0 in st.session_state
                     st.session_state['question_index'] = 0
 
+                    if store.count_questions(quiz_id) > 0:
+                        st.query_params["quiz"] = quiz_id
+                        st.rerun()
+                    elif store.get_quiz(quiz_id)["error"]:
+                        st.error(f"Quiz generation failed: {store.get_quiz(quiz_id)['error']}")
+
+    # ----------------- Waiting for the first question -----------------
+    # (e.g. a ?quiz=<id> link to a quiz whose generation is still queued in the quiz service)
+    elif st.session_state.get("display_quiz") and quiz['questions_available'] == 0:
+        st.header("Generated Quiz Question: ")
+        st.info(f"Waiting for the first of {quiz['num_questions']} questions...")
+        st.button("Check for new questions")
+
     # ----------------- Quiz Display Screen -----------------
-    elif st.session_state["display_quiz"]:
+    elif st.session_state.get("display_quiz"):
 
         st.empty()
         with st.container():
             st.header("Generated Quiz Question: ")
 
-            quiz_manager = QuizManager(st.session_state['question_bank'])
+            quiz_id = quiz['quiz_id']
+            quiz_manager = QuizManager(store=store, quiz_id=quiz_id)
+
+            # While the background worker is still running, tell the user more questions are coming
+            if generating:
+                st.info(f"Generated {quiz_manager.total_questions} of {quiz['num_questions']} questions, more are on the way...")
+                st.button("Check for new questions")
+            elif quiz['error']:
+                st.warning(f"Quiz generation stopped early: {quiz['error']}")
 
             # Format the question and display it
             with st.form("MCQ"):
@@ -113,8 +186,25 @@ if __name__ == "__main__":
 
                 if answer_choice and answer is not None:
                     correct_answer_key = index_question['answer']
-                    if answer.startswith(correct_answer_key):
+                    correct = answer.startswith(correct_answer_key)
+                    store.record_attempt(
+                        quiz_id,
+                        st.session_state["question_index"] % quiz_manager.total_questions,
+                        st.session_state['session_id'],
+                        answer.split(")")[0],
+                        correct
+                    )
+                    if correct:
                         st.success("Correct!")
                     else:
                         st.error("Incorrect!")
                     st.write(f"Explanation: {index_question['explanation']}")
+
+            score = store.score(quiz_id, st.session_state['session_id'])
+            st.caption(f"Score: {score['correct']} / {score['total']} ({score['answered']} answered). "
+                       f"Share or resume this quiz with the link ?quiz={quiz_id}")
+
+    # ----------------- Debug Panel -----------------
+    if st.sidebar.checkbox("Show performance debug panel"):
+        with st.sidebar:
+            render_debug_panel(run_id=st.session_state.get('trace_run_id'))
@@ -0,0 +1,233 @@
+# telemetry.py
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    Lightweight per-stage tracing for the quiz pipeline:
+      - span(stage, **attrs) times a block; numeric attrs are counts/volumes (pages, bytes, texts, tokens, ...)
+        and are summed into the totals, anything else (configuration, labels) is only kept with the span
+      - spans are grouped into runs (start_run() / run()), the last runs are kept in memory
+      - totals per stage are exported in Prometheus text format; spans can be appended to a JSON-lines file
+    Nested spans are tracked per thread, so each span also records its self time (excluding child spans).
+    The current run is a context variable, so concurrent sessions each trace into their own run; threads
+    started for a run must be given a copy of the starting context (contextvars.copy_context()).
+    """
+    def __init__(self, max_runs=20, jsonl_path=None):
+        """
+        max_runs: Number of most recent runs kept in memory.
+        jsonl_path: If set, every finished span is appended to this JSON-lines file.
+        """
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._runs = deque(maxlen=max_runs)
+        self._run_id = contextvars.ContextVar("quizzify_trace_run", default=None)
+        self._totals = {}  # stage -> {"calls", "errors", "seconds", <numeric attrs>...}
+
+    def start_run(self, name="run"):
+        """
+        Starts a new run and makes it the current run of this context; spans finished from now on in this
+        context (and in threads started with a copy of it) are attached to it. Returns the run ID.
+        """
+        run = {"run_id": uuid.uuid4().hex[:12], "name": name, "started": time.time(), "spans": []}
+        with self._lock:
+            self._runs.append(run)
+        self._run_id.set(run["run_id"])
+        return run["run_id"]
+
+    @contextmanager
+    def run(self, name="run"):
+        """
+        Starts a run for the enclosed block (see start_run()) and yields its ID; afterwards the
+        previous run is current again.
+        """
+        token = self._run_id.set(None)
+        try:
+            yield self.start_run(name)
+        finally:
+            self._run_id.reset(token)
+
+    def _find_run(self, run_id):
+        # Must be called with self._lock held
+        for run in reversed(self._runs):
+            if run["run_id"] == run_id:
+                return run
+        return None
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        """
+        Times the enclosed block as `stage`. The yielded dict can be updated with more attributes.
+        """
+        stack = self._stack()
+        record = {"stage": stage, "attrs": dict(attrs), "children_seconds": 0.0}
+        stack.append(record)
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            yield record["attrs"]
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1]["children_seconds"] += duration
+            self._finish(stage, record["attrs"], duration, duration - record["children_seconds"], status,
+                         parent=stack[-1]["stage"] if stack else None)
+
+    def _finish(self, stage, attrs, duration, self_seconds, status, parent):
+        span = {
+            "ts": time.time(),
+            "stage": stage,
+            "parent": parent,
+            "seconds": duration,
+            "self_seconds": self_seconds,
+            "status": status,
+            "attrs": attrs,
+        }
+        run_id = self._run_id.get()
+        with self._lock:
+            run = self._find_run(run_id) if run_id else None
+            if run is not None:
+                span["run_id"] = run_id
+                run["spans"].append(span)
+
+            totals = self._totals.setdefault(stage, {"calls": 0, "errors": 0, "seconds": 0.0})
+            totals["calls"] += 1
+            totals["seconds"] += duration
+            if status == "error":
+                totals["errors"] += 1
+            for key, value in attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] = totals.get(key, 0) + value
+
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a") as f:
+                    f.write(json.dumps(span) + "\n")
+
+    def last_run(self):
+        """
+        Returns the most recent run of the whole process ({"run_id", "name", "started", "spans"}) or None.
+        """
+        with self._lock:
+            if not self._runs:
+                return None
+            run = self._runs[-1]
+            return {**run, "spans": list(run["spans"])}
+
+    def get_run(self, run_id):
+        """
+        Returns the run with this ID, or None if it is unknown or no longer kept in memory.
+        """
+        with self._lock:
+            run = self._find_run(run_id)
+            return {**run, "spans": list(run["spans"])} if run else None
+
+    @staticmethod
+    def breakdown(run) -> dict:
+        """
+        Aggregates a run's spans per stage: calls, total seconds, self seconds and summed numeric attributes.
+        """
+        stages = {}
+        for span in (run or {}).get("spans", []):
+            entry = stages.setdefault(span["stage"], {"calls": 0, "seconds": 0.0, "self_seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += span["seconds"]
+            entry["self_seconds"] += span["self_seconds"]
+            for key, value in span["attrs"].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    entry[key] = entry.get(key, 0) + value
+        return stages
+
+    def export_prometheus(self, prefix="quizzify") -> str:
+        """
+        Returns the process-wide stage totals in Prometheus text exposition format.
+        """
+        with self._lock:
+            totals = {stage: dict(values) for stage, values in self._totals.items()}
+
+        metric_names = {"calls": "calls_total", "errors": "errors_total", "seconds": "seconds_total"}
+        for values in totals.values():
+            for key in values:
+                metric_names.setdefault(key, f"{key}_total")
+
+        lines = []
+        for key, name in sorted(metric_names.items(), key=lambda item: item[1]):
+            metric = f"{prefix}_stage_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            for stage in sorted(totals):
+                if key in totals[stage]:
+                    lines.append(f'{metric}{{stage="{stage}"}} {totals[stage][key]}')
+        return "\n".join(lines) + "\n"
+
+    def export_jsonl(self, path, run=None):
+        """
+        Appends the spans of `run` (default: the last run) to a JSON-lines file.
+        """
+        run = run or self.last_run()
+        if not run:
+            return
+        with open(path, "a") as f:
+            for span in run["spans"]:
+                f.write(json.dumps(span) + "\n")
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Returns the process-wide Tracer. Set QUIZZIFY_TRACE_JSONL to stream every span to a file.
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(jsonl_path=os.environ.get("QUIZZIFY_TRACE_JSONL"))
+        return _tracer
+
+
+def render_debug_panel(tracer=None, run_id=None):
+    """
+    Streamlit panel showing the per-stage breakdown of a run (the session's last run, whose ID the app keeps
+    in st.session_state).
+    """
+    import streamlit as st
+
+    tracer = tracer or get_tracer()
+    run = tracer.get_run(run_id) if run_id else None
+    st.subheader("Performance (last run)")
+    if not run or not run["spans"]:
+        st.write("No spans recorded yet.")
+        return
+
+    rows = []
+    for stage, entry in sorted(Tracer.breakdown(run).items(), key=lambda item: -item[1]["self_seconds"]):
+        row = {"stage": stage, "calls": entry["calls"],
+               "self ms": round(entry["self_seconds"] * 1000, 1), "total ms": round(entry["seconds"] * 1000, 1)}
+        row.update({k: v for k, v in entry.items() if k not in ("calls", "seconds", "self_seconds")})
+        rows.append(row)
+    st.write(f"Run {run['run_id']} ({run['name']})")
+    st.dataframe(rows)
+    st.download_button("Download Prometheus metrics", tracer.export_prometheus(), file_name="quizzify_metrics.prom")
+    st.download_button(
+        "Download spans (JSON lines)",
+        "".join(json.dumps(span) + "\n" for span in run["spans"]),
+        file_name=f"quizzify_{run['run_id']}.jsonl"
+    )
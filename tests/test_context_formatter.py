@@ -0,0 +1,47 @@
+# test_context_formatter.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.documents import Document
+from langchain_text_splitters import CharacterTextSplitter
+
+from context_formatter import ContextFormatter
+
+
+def _page_docs(*texts):
+    return [Document(page_content=text, metadata={"source": "bio.pdf", "page": 0}) for text in texts]
+
+
+def test_keeps_chunks_that_only_share_a_word():
+    formatter = ContextFormatter()
+    context = formatter.format_documents(_page_docs(
+        "Cells divide by mitosis",
+        "stages of mitosis are listed here. Cells",
+    ))
+    assert context == "Cells divide by mitosis\n\nstages of mitosis are listed here. Cells"
+
+
+def test_keeps_chunks_that_touch_at_a_word_boundary():
+    formatter = ContextFormatter()
+    context = formatter.format_documents(_page_docs(
+        "Photosynthesis converts light into chemical energy",
+        "energy is stored as glucose in the plant cells",
+    ))
+    assert "chemical energy" in context
+    assert "energy is stored as glucose" in context
+
+
+def test_strips_real_splitter_overlap():
+    lines = [f"Line {i}: the mitochondria is the powerhouse of the cell, producing ATP." for i in range(40)]
+    text = "\n".join(lines)
+    chunks = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200).split_text(text)
+    assert len(chunks) >= 2 and lines[13] in chunks[0] and lines[13] in chunks[1]
+
+    formatter = ContextFormatter(token_budget=10_000, separator="\n")
+    assert formatter.format_documents(_page_docs(*chunks)) == text
+    # Retrieved in reverse order, the repeated lines are removed from the end of the earlier chunk instead
+    assert formatter.format_documents(_page_docs(chunks[1], chunks[0])) == chunks[1] + "\n" + "\n".join(
+        line for line in chunks[0].split("\n") if line not in chunks[1]
+    )
@@ -4,12 +4,9 @@ import sys
 import json
 
 sys.path.append(os.path.abspath('../../'))
-from File_uploader import DocumentProcessor
-from vertex_embedding import EmbeddingClient
-from integration import ChromaCollectionCreator
 
-from langchain_core.prompts import PromptTemplate
-from langchain_google_vertexai import VertexAI
+# QuizManager is used on the quiz display screen, so the LangChain / Vertex AI / pipeline imports
+# below are deferred to the code paths that need them.
 
 
 class QuizGenerator:
@@ -60,6 +57,8 @@ class QuizGenerator:
         """
         Initializes and configures the Large Language Model (LLM) for generating quiz questions.
         """
+        from langchain_google_vertexai import VertexAI
+
         self.llm = VertexAI(
             model_name="gemini-pro",  # Or chat-gemini@001, text-bison@002, etc.
             temperature=0.8,  # A bit higher for variability
@@ -78,6 +77,7 @@ class QuizGenerator:
         if not self.vectorstore:
             raise ValueError("Vectorstore not provided.")
 
+        from langchain_core.prompts import PromptTemplate
         from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 
         # Suppose your ChromaCollectionCreator has self.db = Chroma(...) inside
@@ -138,14 +138,23 @@ class QuizGenerator:
 ###################### QUIZ MANAGER ##########################
 class QuizManager:
     ##########################################################
-    def __init__(self, questions: list):
+    def __init__(self, questions: list = None, store=None, quiz_id=None):
         """
-        Task: Initialize the QuizManager class with a list of quiz questions.
+        Task: Initialize the QuizManager class with a list of quiz questions,
+        or with a QuizStore and quiz ID to read the questions lazily from the server-side store.
         """
-        # 1) Store the provided list in an instance variable
+        # 1) Store the provided list (or the store handle) in instance variables.
+        #    The quiz may still be growing while questions are generated in the background.
         self.questions = questions
-        # 2) Calculate the total number
-        self.total_questions = len(questions)
+        self.store = store
+        self.quiz_id = quiz_id
+
+    @property
+    def total_questions(self):
+        # 2) Calculate the total number on access, so newly generated questions are included
+        if self.store is not None:
+            return self.store.count_questions(self.quiz_id)
+        return len(self.questions)
 
     ##########################################################
 
@@ -154,7 +163,12 @@ class QuizManager:
         Retrieves the quiz question object at the specified index,
         wrapping around if out of bounds.
         """
-        valid_index = index % self.total_questions
+        total_questions = self.total_questions
+        if total_questions == 0:
+            raise IndexError("The quiz has no questions yet")
+        valid_index = index % total_questions
+        if self.store is not None:
+            return self.store.get_question(self.quiz_id, valid_index)
         return self.questions[valid_index]
 
     ##########################################################
@@ -165,6 +179,9 @@ class QuizManager:
         if "question_index" not in st.session_state:
             st.session_state["question_index"] = 0
 
+        if self.total_questions == 0:
+            return
+
         current_index = st.session_state["question_index"]
         # Move forward or backward
         new_index = (current_index + direction) % self.total_questions
@@ -174,6 +191,10 @@ class QuizManager:
 
 # Test Generating the Quiz + Using the QuizManager
 if __name__ == "__main__":
+    from File_uploader import DocumentProcessor
+    from vertex_embedding import EmbeddingClient
+    from integration import ChromaCollectionCreator
+
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/Users/liuhaibo/gcloud_key/geminisample-425519-a9f2d1d62e3b.json"
     embed_config = {
         "model_name": "textembedding-gecko@003",
@@ -2,30 +2,55 @@
 
 import os
 import streamlit as st
-from langchain_google_vertexai import VertexAIEmbeddings
+from vertex_scheduler import get_scheduler, INTERACTIVE, BACKGROUND
+from telemetry import get_tracer
 
 class EmbeddingClient:
     """
     Vertex AI Embeddings：
       - embed_query(text)
       - embed_documents([text1, text2, ...])
+    All calls go through the process-wide request scheduler (rate limits, priorities, coalescing).
     """
-    def __init__(self, model_name, location):
-        self.client = VertexAIEmbeddings(
-            model_name=model_name,
-            location=location
-        )
+    def __init__(self, model_name, location, client=None):
+        """
+        client: Optional object with embed_query/embed_documents to use instead of VertexAIEmbeddings
+                (e.g. a local stand-in for benchmarks).
+        """
+        self.model_name = model_name
+        if client is not None:
+            self.client = client
+        else:
+            # Imported here so modules that only pass an EmbeddingClient around don't load the Vertex SDK
+            from langchain_google_vertexai import VertexAIEmbeddings
 
-    def embed_query(self, query):
+            self.client = VertexAIEmbeddings(
+                model_name=model_name,
+                location=location
+            )
+
+    def embed_query(self, query, priority=INTERACTIVE):
         try:
-            return self.client.embed_query(query)
+            with get_tracer().span("embed_query", texts=1, chars=len(query)):
+                return get_scheduler().call(
+                    self.model_name,
+                    lambda: self.client.embed_query(query),
+                    priority=priority,
+                    coalesce_key=("embed_query", self.model_name, query)
+                )
         except Exception as e:
             st.error(f"Error embedding query: {e}")
             return None
 
-    def embed_documents(self, documents):
+    def embed_documents(self, documents, priority=BACKGROUND):
         try:
-            return self.client.embed_documents(documents)
+            with get_tracer().span("embed_documents", texts=len(documents), chars=sum(len(d) for d in documents)):
+                return get_scheduler().call(
+                    self.model_name,
+                    lambda: self.client.embed_documents(documents),
+                    priority=priority,
+                    coalesce_key=("embed_documents", self.model_name, tuple(documents))
+                )
         except Exception as e:
             st.error(f"Error embedding documents: {e}")
             return None
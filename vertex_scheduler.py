@@ -0,0 +1,277 @@
+# vertex_scheduler.py
+
+import threading
+import time
+import itertools
+from collections import deque
+from concurrent.futures import Future
+
+# Priority classes: lower numbers are dispatched first.
+INTERACTIVE = 0   # e.g. quiz generation and query embeddings a learner is waiting for
+BACKGROUND = 10   # e.g. embedding document chunks during ingestion
+
+# Requests per second and burst size for each Vertex AI model.
+DEFAULT_MODEL_LIMITS = {
+    "textembedding-gecko@003": (10.0, 20),
+    "gemini-pro": (2.0, 5),
+}
+DEFAULT_LIMIT = (5.0, 10)
+
+# Substrings of error messages that mean "quota exceeded, try again later".
+QUOTA_ERROR_MARKERS = ("429", "ResourceExhausted", "Quota exceeded", "quota")
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens are added per second, up to `capacity`.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """
+        Returns 0 if a token is available right now, otherwise the number of seconds until one is.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class _Request:
+    def __init__(self, seq, model, priority, coalesce_key):
+        self.seq = seq
+        self.model = model
+        self.priority = priority
+        self.coalesce_key = coalesce_key
+        self.future = Future()  # Shared with coalesced callers
+        self.enqueued = time.monotonic()
+        self.not_before = 0.0
+        self.attempts = 0
+
+    def sort_key(self):
+        return (self.priority, self.seq)
+
+
+class RequestScheduler:
+    """
+    Process-wide admission control for Vertex AI calls:
+      - token-bucket rate limit per model, and optionally a cap on concurrent calls per model
+      - priority classes (INTERACTIVE before BACKGROUND) when callers wait for the same model
+      - coalescing of identical in-flight requests (same coalesce_key share one call)
+      - queue-depth and wait-time metrics
+    The scheduler has no threads of its own: a caller waits until its request is admitted and then makes
+    the call in its own thread, so slow calls of one model never hold up another model's calls.
+    """
+    def __init__(self, model_limits=None, max_in_flight=None, max_retries=2, retry_backoff=2.0):
+        """
+        model_limits: {model_name: (requests_per_second, burst)}; unknown models use DEFAULT_LIMIT.
+        max_in_flight: Maximum number of concurrent calls per model (None: only the rate limit applies).
+        max_retries: How many times a request failing with a quota error is re-queued.
+        retry_backoff: Seconds to wait before the first retry (doubled for each further retry).
+        """
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._limits = dict(DEFAULT_MODEL_LIMITS)
+        self._limits.update(model_limits or {})
+        self._buckets = {}
+        self._queue = []  # Requests waiting to be admitted
+        self._running = {}  # model -> number of calls in progress
+        self._inflight = {}  # coalesce_key -> _Request
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "coalesced": 0,
+            "retried": 0,
+        }
+        self._waits = {}  # priority -> deque of recent queue wait times (seconds)
+
+    def configure_model(self, model, rate, burst):
+        """
+        Sets the rate limit (requests per second and burst size) for a model.
+        """
+        with self._cond:
+            self._limits[model] = (rate, burst)
+            self._buckets.pop(model, None)
+            self._cond.notify_all()
+
+    def _bucket(self, model):
+        if model not in self._buckets:
+            rate, burst = self._limits.get(model, DEFAULT_LIMIT)
+            self._buckets[model] = TokenBucket(rate, burst)
+        return self._buckets[model]
+
+    def call(self, model, fn, priority=INTERACTIVE, coalesce_key=None):
+        """
+        Runs `fn()` under `model`'s limits in the calling thread and returns its result (or raises its exception).
+        If `coalesce_key` is given and an identical request is already waiting or running,
+        waits for that request's result instead of making another call.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("RequestScheduler has been shut down")
+            self._stats["submitted"] += 1
+
+            if coalesce_key is not None and coalesce_key in self._inflight:
+                existing = self._inflight[coalesce_key]
+                self._stats["coalesced"] += 1
+                # An interactive caller waiting on a queued background request promotes it.
+                existing.priority = min(existing.priority, priority)
+                self._cond.notify_all()
+                future = existing.future
+            else:
+                future = None
+                request = _Request(next(self._seq), model, priority, coalesce_key)
+                if coalesce_key is not None:
+                    self._inflight[coalesce_key] = request
+                self._queue.append(request)
+        if future is not None:
+            return future.result()
+
+        while True:
+            self._admit(request)
+            try:
+                result = fn()
+            except Exception as e:
+                if self._should_retry(request, e):
+                    continue
+                self._finish(request, "failed")
+                request.future.set_exception(e)
+                raise
+            self._finish(request, "completed")
+            request.future.set_result(result)
+            return result
+
+    def _delay(self, request, now):
+        """
+        Seconds until `request` may start (0: now), or None if it has to wait for another request
+        (a higher-priority one for the same model, or a free concurrency slot). Must be called with self._cond held.
+        """
+        if request.not_before > now:
+            return request.not_before - now
+        for other in self._queue:
+            if other.model == request.model and other.not_before <= now and other.sort_key() < request.sort_key():
+                return None
+        if self.max_in_flight is not None and self._running.get(request.model, 0) >= self.max_in_flight:
+            return None
+        return self._bucket(request.model).delay(now)
+
+    def _admit(self, request):
+        """
+        Blocks until `request` is the next request of its model and a token (and slot) is available, then takes them.
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    self._queue.remove(request)
+                    self._finish_locked(request, "failed")
+                    error = RuntimeError("RequestScheduler has been shut down")
+                    request.future.set_exception(error)
+                    raise error
+                delay = self._delay(request, time.monotonic())
+                if delay == 0:
+                    break
+                self._cond.wait(timeout=delay)
+            self._bucket(request.model).consume()
+            self._queue.remove(request)
+            self._running[request.model] = self._running.get(request.model, 0) + 1
+            if request.attempts == 0:
+                waits = self._waits.setdefault(request.priority, deque(maxlen=1000))
+                waits.append(time.monotonic() - request.enqueued)
+            # The next waiter for this model may be able to start as well
+            self._cond.notify_all()
+
+    def _should_retry(self, request, error):
+        if request.attempts >= self.max_retries:
+            return False
+        if not any(marker in str(error) for marker in QUOTA_ERROR_MARKERS):
+            return False
+        with self._cond:
+            self._running[request.model] -= 1
+            request.not_before = time.monotonic() + self.retry_backoff * (2 ** request.attempts)
+            request.attempts += 1
+            self._stats["retried"] += 1
+            self._queue.append(request)
+            self._cond.notify_all()
+        return True
+
+    def _finish(self, request, outcome):
+        with self._cond:
+            self._running[request.model] -= 1
+            self._finish_locked(request, outcome)
+
+    def _finish_locked(self, request, outcome):
+        if request.coalesce_key is not None and self._inflight.get(request.coalesce_key) is request:
+            del self._inflight[request.coalesce_key]
+        self._stats[outcome] += 1
+        self._cond.notify_all()
+
+    def shutdown(self):
+        """
+        Stops admitting requests: new calls and calls still waiting for admission raise RuntimeError.
+        Calls already running finish normally.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def metrics(self) -> dict:
+        """
+        Returns a snapshot of queue depth, counters and queue wait times per priority class.
+        """
+        with self._cond:
+            depth = {}
+            for request in self._queue:
+                depth[request.priority] = depth.get(request.priority, 0) + 1
+
+            wait_times = {}
+            for priority, waits in self._waits.items():
+                ordered = sorted(waits)
+                if not ordered:
+                    continue
+                wait_times[priority] = {
+                    "count": len(ordered),
+                    "mean": sum(ordered) / len(ordered),
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max": ordered[-1],
+                }
+
+            return {
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": depth,
+                "running_by_model": {model: count for model, count in self._running.items() if count},
+                "in_flight_coalescable": len(self._inflight),
+                "wait_seconds_by_priority": wait_times,
+                **self._stats,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    Returns the process-wide RequestScheduler shared by every Streamlit session.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler